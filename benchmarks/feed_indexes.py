@@ -0,0 +1,144 @@
+"""Планы и время запросов лент до и после составных индексов (0012).
+
+Создает отдельную базу SQLite, заполняет ее постами и комментариями
+напрямую через executemany, затем для лент группы, автора и
+комментариев поста печатает EXPLAIN QUERY PLAN и медиану времени
+сначала на схеме 0011, потом после миграции 0012.
+
+    python benchmarks/feed_indexes.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BEFORE = '0011_follow_timelineentry'
+AFTER = '0012_feed_indexes'
+
+
+def setup_django(database):
+    sys.path.insert(0, BASE_DIR)
+    os.environ['YATUBE_DB_PATH'] = database
+    os.environ['YATUBE_CACHE_PATH'] = database + '.cache'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    django.setup()
+
+
+def seed(rows, authors, groups):
+    from django.db import connection, transaction
+
+    start = datetime(2015, 1, 1, tzinfo=timezone.utc)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO auth_user (id, password, is_superuser, username, '
+            'first_name, last_name, email, is_staff, is_active, '
+            'date_joined) VALUES (%s, "", 0, %s, "", "", "", 0, 1, %s)',
+            [(pk, f'user{pk}', start) for pk in range(1, authors + 1)]
+        )
+        cursor.executemany(
+            'INSERT INTO posts_group (id, title, slug, description) '
+            'VALUES (%s, %s, %s, "")',
+            [(pk, f'Группа {pk}', f'group{pk}')
+             for pk in range(1, groups + 1)]
+        )
+        batch = 50000
+        for offset in range(0, rows, batch):
+            posts = []
+            comments = []
+            for pk in range(offset + 1, min(offset + batch, rows) + 1):
+                moment = start + timedelta(seconds=pk * 7)
+                posts.append((
+                    pk, f'Пост {pk}', moment, moment,
+                    random.randint(1, authors),
+                    random.choice([None, random.randint(1, groups)])
+                ))
+                comments.append((
+                    pk, random.randint(1, pk), random.randint(1, authors),
+                    f'Комментарий {pk}', moment
+                ))
+            cursor.executemany(
+                'INSERT INTO posts_post (id, text, pub_date, updated, '
+                'author_id, group_id, image) VALUES (%s, %s, %s, %s, %s, '
+                '%s, "")',
+                posts
+            )
+            cursor.executemany(
+                'INSERT INTO posts_comment (id, post_id, author_id, text, '
+                'created) VALUES (%s, %s, %s, %s, %s)',
+                comments
+            )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def feed_queries(authors, groups, rows):
+    from posts.models import Comment, Post
+    from posts.settings import COMMENTS_PAGE_SIZE, PAGE_SIZE
+
+    return {
+        'group_posts': Post.objects.feed().filter(
+            group_id=random.randint(1, groups)
+        ).order_by('-pub_date', '-id')[:PAGE_SIZE],
+        'profile': Post.objects.feed().filter(
+            author_id=random.randint(1, authors)
+        ).order_by('-pub_date', '-id')[:PAGE_SIZE],
+        'post_view comments': Comment.objects.filter(
+            post_id=random.randint(1, rows)
+        ).order_by('-created', '-id')[:COMMENTS_PAGE_SIZE],
+    }
+
+
+def measure(label, queries, repeat):
+    from django.db import connection
+
+    print(f'\n=== {label} ===')
+    for name, queryset in queries.items():
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+        print(f'\n{name}: медиана {statistics.median(timings):.2f} мс')
+        for line in plan:
+            print(f'  {line}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--authors', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args()
+    directory = tempfile.mkdtemp()
+    setup_django(os.path.join(directory, 'benchmark.sqlite3'))
+
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    call_command('migrate', 'posts', BEFORE, verbosity=0)
+    started = time.perf_counter()
+    seed(options.rows, options.authors, options.groups)
+    print(f'Заполнено {options.rows} постов и комментариев за '
+          f'{time.perf_counter() - started:.1f} с')
+    queries = feed_queries(options.authors, options.groups, options.rows)
+    measure(f'до {AFTER}', queries, options.repeat)
+    started = time.perf_counter()
+    call_command('migrate', 'posts', AFTER, verbosity=0)
+    print(f'\nМиграция {AFTER}: {time.perf_counter() - started:.1f} с')
+    measure(f'после {AFTER}', queries, options.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""Смешанная нагрузка чтения и записи на SQLite в двух профилях базы.
+
+Для каждого профиля (development и production, см. DB_PROFILE в
+settings.py) создает отдельную базу, заполняет ее и запускает
+процессы-читатели (лента группы и комментарии поста) и
+процессы-писатели (новые комментарии). Каждая операция обрамлена
+сигналами request_started/request_finished, поэтому соединения
+открываются и закрываются так же, как при обработке запросов.
+Печатает число операций в секунду, задержки и число ошибок
+"database is locked".
+
+    python benchmarks/sqlite_concurrency.py --readers 8 --writers 2
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ('development', 'production')
+
+
+def setup_django(database, profile):
+    sys.path.insert(0, BASE_DIR)
+    os.environ['YATUBE_DB_PATH'] = database
+    os.environ['YATUBE_CACHE_PATH'] = database + '.cache'
+    os.environ['YATUBE_DB_PROFILE'] = profile
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    django.setup()
+
+
+def prepare(database, profile, posts, authors, groups):
+    setup_django(database, profile)
+
+    from django.core.management import call_command
+    from django.db import transaction
+
+    from posts.models import Group, Post, User
+
+    call_command('migrate', verbosity=0)
+    with transaction.atomic():
+        User.objects.bulk_create(
+            User(username=f'user{pk}') for pk in range(authors))
+        Group.objects.bulk_create(
+            Group(title=f'Группа {pk}', slug=f'group{pk}')
+            for pk in range(groups)
+        )
+        author_ids = list(User.objects.values_list('id', flat=True))
+        group_ids = list(Group.objects.values_list('id', flat=True))
+        Post.objects.bulk_create(
+            (
+                Post(
+                    text=f'Пост {pk}',
+                    author_id=random.choice(author_ids),
+                    group_id=random.choice(group_ids)
+                )
+                for pk in range(posts)
+            )
+        )
+
+
+def read(author_ids, group_ids, post_ids):
+    from posts.models import Comment, Post
+    from posts.settings import COMMENTS_PAGE_SIZE, PAGE_SIZE
+
+    list(Post.objects.feed().filter(
+        group_id=random.choice(group_ids)
+    )[:PAGE_SIZE])
+    list(Comment.objects.filter(
+        post_id=random.choice(post_ids)
+    )[:COMMENTS_PAGE_SIZE])
+
+
+def write(author_ids, group_ids, post_ids):
+    from posts.models import Comment
+
+    Comment.objects.create(
+        post_id=random.choice(post_ids),
+        author_id=random.choice(author_ids),
+        text='Комментарий под нагрузкой'
+    )
+
+
+def worker(database, profile, kind, duration, results):
+    setup_django(database, profile)
+
+    from django.core.signals import request_finished, request_started
+    from django.db import OperationalError
+
+    from posts.models import Group, Post, User
+
+    author_ids = list(User.objects.values_list('id', flat=True))
+    group_ids = list(Group.objects.values_list('id', flat=True))
+    post_ids = list(Post.objects.values_list('id', flat=True))
+    operation = read if kind == 'read' else write
+    timings = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        request_started.send(sender=None)
+        try:
+            operation(author_ids, group_ids, post_ids)
+        except OperationalError:
+            errors += 1
+        finally:
+            request_finished.send(sender=None)
+        timings.append((time.perf_counter() - started) * 1000)
+    results.put((kind, timings, errors))
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def run(profile, options):
+    directory = tempfile.mkdtemp()
+    database = os.path.join(directory, 'benchmark.sqlite3')
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(target=prepare, args=(
+        database, profile, options.posts, options.authors, options.groups))
+    process.start()
+    process.join()
+    if process.exitcode:
+        raise SystemExit(f'Не удалось подготовить базу для {profile}')
+    results = context.Queue()
+    kinds = ['read'] * options.readers + ['write'] * options.writers
+    processes = [
+        context.Process(target=worker, args=(
+            database, profile, kind, options.duration, results))
+        for kind in kinds
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    print(f'\n=== {profile} ===')
+    for kind in ('read', 'write'):
+        timings = sorted(
+            value for name, values, _ in collected if name == kind
+            for value in values
+        )
+        errors = sum(count for name, _, count in collected if name == kind)
+        if not timings:
+            continue
+        print(
+            f'{kind}: {len(timings) / options.duration:.0f} оп/с, '
+            f'медиана {statistics.median(timings):.2f} мс, '
+            f'p95 {percentile(timings, 0.95):.2f} мс, '
+            f'p99 {percentile(timings, 0.99):.2f} мс, '
+            f'максимум {timings[-1]:.2f} мс, ошибок {errors}'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--authors', type=int, default=200)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument(
+        '--profile', choices=PROFILES, action='append', dest='profiles')
+    options = parser.parse_args()
+    for profile in options.profiles or PROFILES:
+        run(profile, options)
+
+
+if __name__ == '__main__':
+    main()
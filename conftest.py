@@ -0,0 +1,10 @@
+import pytest
+
+from yatube.test_runner import temporary_caches
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_caches(django_test_environment):
+    """Тесты под pytest тоже не трогают общий файл кэша."""
+    with temporary_caches():
+        yield
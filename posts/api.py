@@ -0,0 +1,280 @@
+"""Версионированное JSON API только для чтения (/api/v1/).
+
+Списки постов и комментариев листаются курсорами по (дата, id),
+?fields= ограничивает набор полей (и колонок в запросе), авторы и
+группы подгружаются одним запросом на страницу.
+"""
+import json
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from .models import AuthorStats, Group, Post, User
+from .paginator import AFTER, BEFORE, CursorPaginator, InvalidCursor
+from .settings import API_MAX_PAGE_SIZE, PAGE_SIZE
+from .storage import content_storage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Поле API -> колонки, которые нужны для него в values()
+POST_FIELDS = {
+    'id': ('id',),
+    'text': ('text',),
+    'pub_date': ('pub_date',),
+    'updated': ('updated',),
+    'author': ('author_id',),
+    'group': ('group_id',),
+    'image': ('image',),
+}
+COMMENT_FIELDS = {
+    'id': ('id',),
+    'post': ('post_id',),
+    'text': ('text',),
+    'created': ('created',),
+    'author': ('author_id',),
+}
+PROFILE_FIELDS = (
+    'id', 'username', 'name', 'posts_count', 'comments_count',
+    'followers_count', 'following_count',
+)
+GROUP_FIELDS = ('id', 'slug', 'title', 'description')
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def dumps(data):
+    """JSON в байтах: через orjson, если он установлен, иначе json.
+
+    Даты в обоих случаях форматирует DjangoJSONEncoder, поэтому ответ
+    от наличия orjson не зависит.
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            data,
+            default=DjangoJSONEncoder().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME
+        )
+    return json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False,
+        separators=(',', ':')
+    ).encode()
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        dumps(data), status=status, content_type='application/json')
+
+
+def api_view(view):
+    """GET-представление API: ответ и ошибки в JSON."""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return json_response(view(request, *args, **kwargs))
+        except ApiError as error:
+            return json_response({'detail': error.detail}, error.status)
+        except Http404:
+            return json_response({'detail': 'Не найдено'}, 404)
+    return wrapper
+
+
+def requested_fields(request, available):
+    fields = [
+        name.strip()
+        for name in request.GET.get('fields', '').split(',')
+        if name.strip()
+    ]
+    if not fields:
+        return list(available)
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(400, f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', PAGE_SIZE))
+    except ValueError:
+        raise ApiError(400, 'limit должен быть числом')
+    return min(max(size, 1), API_MAX_PAGE_SIZE)
+
+
+class ValuesCursorPaginator(CursorPaginator):
+    """CursorPaginator для values(): ключ берется из словаря."""
+
+    def _key(self, item):
+        return [item[name] for name in self.fields]
+
+
+def page_url(request, parameter, cursor):
+    query = request.GET.copy()
+    query.pop(AFTER, None)
+    query.pop(BEFORE, None)
+    query[parameter] = cursor
+    return request.build_absolute_uri(
+        f'{request.path}?{urlencode(sorted(query.items()))}')
+
+
+def cursor_list(request, queryset, field_map, ordering, serialize):
+    """Страница values()-выборки с курсорами next и previous."""
+    fields = requested_fields(request, field_map)
+    keys = [name.lstrip('-') for name in ordering]
+    columns = {column for name in fields for column in field_map[name]}
+    paginator = ValuesCursorPaginator(
+        queryset.values(*columns.union(keys)), page_size(request), ordering)
+    after = request.GET.get(AFTER) or None
+    before = None if after else request.GET.get(BEFORE) or None
+    try:
+        page = paginator.get_page(after=after, before=before)
+    except InvalidCursor:
+        raise ApiError(400, 'Неверный курсор')
+    return {
+        'results': serialize(list(page), fields),
+        'next': page_url(request, AFTER, page.next_cursor)
+        if page.has_next() else None,
+        'previous': page_url(request, BEFORE, page.previous_cursor)
+        if page.has_previous() else None,
+    }
+
+
+def load_authors(author_ids):
+    return {
+        author['id']: {
+            'id': author['id'],
+            'username': author['username'],
+            'name': ' '.join(filter(
+                None, [author['first_name'], author['last_name']])),
+        }
+        for author in User.objects.filter(pk__in=set(author_ids)).values(
+            'id', 'username', 'first_name', 'last_name')
+    }
+
+
+def load_groups(group_ids):
+    group_ids = set(group_ids) - {None}
+    if not group_ids:
+        return {}
+    return {
+        group['id']: group
+        for group in Group.objects.filter(pk__in=group_ids).values(
+            'id', 'slug', 'title')
+    }
+
+
+def serialize_rows(rows, fields, field_map):
+    """Оставляет в строках только запрошенные поля.
+
+    Связанные объекты (author, group) загружаются пачкой на всю
+    страницу.
+    """
+    authors = groups = {}
+    if 'author' in fields:
+        authors = load_authors(row['author_id'] for row in rows)
+    if 'group' in fields:
+        groups = load_groups(row['group_id'] for row in rows)
+    results = []
+    for row in rows:
+        item = {}
+        for name in fields:
+            if name == 'author':
+                item[name] = authors.get(row['author_id'])
+            elif name == 'group':
+                item[name] = groups.get(row['group_id'])
+            elif name == 'image':
+                item[name] = (
+                    content_storage.url(row['image']) if row['image']
+                    else None
+                )
+            else:
+                item[name] = row[field_map[name][0]]
+        results.append(item)
+    return results
+
+
+def serialize_posts(rows, fields):
+    return serialize_rows(rows, fields, POST_FIELDS)
+
+
+def serialize_comments(rows, fields):
+    return serialize_rows(rows, fields, COMMENT_FIELDS)
+
+
+def post_list(request, queryset):
+    return cursor_list(
+        request, queryset, POST_FIELDS, ('-pub_date', '-id'),
+        serialize_posts
+    )
+
+
+@api_view
+def posts(request):
+    return post_list(request, Post.objects.all())
+
+
+@api_view
+def post_detail(request, post_id):
+    fields = requested_fields(request, POST_FIELDS)
+    columns = {column for name in fields for column in POST_FIELDS[name]}
+    row = get_object_or_404(Post.objects.values(*columns), pk=post_id)
+    return serialize_posts([row], fields)[0]
+
+
+@api_view
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    return cursor_list(
+        request, post.comments.all(), COMMENT_FIELDS, ('-created', '-id'),
+        serialize_comments
+    )
+
+
+@api_view
+def groups(request):
+    fields = requested_fields(request, GROUP_FIELDS)
+    return {
+        'results': list(
+            Group.objects.order_by('title').values(*fields))
+    }
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return post_list(request, Post.objects.filter(group=group))
+
+
+@api_view
+def profile(request, username):
+    fields = requested_fields(request, PROFILE_FIELDS)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    stats = AuthorStats.get_for(author)
+    values = {
+        'id': author.id,
+        'username': author.username,
+        'name': author.get_full_name(),
+    }
+    return {
+        name: values[name] if name in values else getattr(stats, name)
+        for name in fields
+    }
+
+
+@api_view
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    return post_list(request, Post.objects.filter(author=author))
@@ -0,0 +1,115 @@
+"""Холодный архив старых постов.
+
+archive_batch переносит посты вместе с комментариями в таблицы
+ArchivedPost и ArchivedComment с теми же id; горячие таблицы и их
+индексы остаются маленькими. Страница поста и профиль автора читают
+архив, когда поста нет в горячей таблице или горячие посты автора
+закончились.
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
+
+from .cache import INDEX_FEED, author_feed, bump_feeds, group_feed, post_feed
+from .models import (ArchivedComment, ArchivedPost, AuthorStats, Comment,
+                     Post, PostImageVariant, ThumbnailJob, TimelineEntry)
+from .search import TABLE as SEARCH_TABLE
+
+POST_COLUMNS = (
+    'id', 'text', 'pub_date', 'updated', 'author_id', 'group_id', 'image')
+COMMENT_COLUMNS = ('id', 'post_id', 'author_id', 'text', 'created')
+
+
+def delete_rows(table, column, ids):
+    # Без сигналов post_delete: пост не удален, а перенесен, поэтому
+    # счетчики автора и ссылки на картинку остаются прежними
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {column} IN ({{}})'.format(
+                ', '.join(['%s'] * len(ids))),
+            ids
+        )
+
+
+def archive_batch(cutoff, batch_size):
+    """Переносит в архив до batch_size постов старше cutoff.
+
+    Возвращает число перенесенных постов.
+    """
+    with transaction.atomic():
+        posts = list(
+            Post.objects.filter(pub_date__lt=cutoff)
+            .order_by('pub_date', 'id').values(*POST_COLUMNS)[:batch_size]
+        )
+        if not posts:
+            return 0
+        ids = [post['id'] for post in posts]
+        ArchivedPost.objects.bulk_create(
+            ArchivedPost(**post) for post in posts)
+        ArchivedComment.objects.bulk_create(
+            ArchivedComment(**comment)
+            for comment in Comment.objects.filter(post_id__in=ids)
+            .values(*COMMENT_COLUMNS).iterator()
+        )
+        # Варианты картинки удаляются с сигналами: их файлы освобождает
+        # release_variant_file, превью архива рисует sorl-thumbnail
+        PostImageVariant.objects.filter(post_id__in=ids).delete()
+        ThumbnailJob.objects.filter(post_id__in=ids).delete()
+        TimelineEntry.objects.filter(post_id__in=ids).delete()
+        delete_rows(Comment._meta.db_table, 'post_id', ids)
+        delete_rows(Post._meta.db_table, 'id', ids)
+        delete_rows(SEARCH_TABLE, 'rowid', ids)
+        authors = Counter(post['author_id'] for post in posts)
+        for author_id, count in authors.items():
+            AuthorStats.change(author_id, archived_posts_count=count)
+    bump_feeds(
+        [INDEX_FEED]
+        + [author_feed(author_id) for author_id in authors]
+        + [group_feed(post['group_id']) for post in posts
+           if post['group_id'] is not None]
+        + [post_feed(post_id) for post_id in ids]
+    )
+    return len(posts)
+
+
+def find_post(hot, cold, username, post_id):
+    """Пост из горячей таблицы, а если его там нет — из архива."""
+    post = hot.filter(author__username=username, id=post_id).first()
+    if post is None:
+        post = get_object_or_404(
+            cold, author__username=username, id=post_id)
+    return post
+
+
+class TieredFeed:
+    """Горячие посты ленты, за ними архивные.
+
+    Паджинатор работает с ней как с queryset: count() и срезы. Архив
+    читается, только когда страница выходит за горячие посты.
+    """
+
+    ordered = True
+
+    def __init__(self, hot, cold, cold_count):
+        self.hot = hot
+        self.cold = cold
+        self.cold_count = cold_count
+
+    @cached_property
+    def hot_count(self):
+        return self.hot.count()
+
+    def count(self):
+        return self.hot_count + self.cold_count
+
+    def __getitem__(self, key):
+        start, stop = key.start or 0, key.stop
+        items = list(self.hot[start:stop])
+        if len(items) == stop - start:
+            return items
+        # Горячие посты кончились: на этой странице или раньше
+        hot_count = start + len(items) if items else self.hot_count
+        return items + list(
+            self.cold[max(start - hot_count, 0):stop - hot_count])
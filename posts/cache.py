@@ -0,0 +1,140 @@
+import time
+
+from django.core.cache import cache
+
+from yatube.replicas import read_tag
+
+from .settings import (SINGLE_FLIGHT_LOCK_TIMEOUT,
+                       SINGLE_FLIGHT_POLL_INTERVAL,
+                       SINGLE_FLIGHT_STALE_TIMEOUT)
+
+INDEX_FEED = 'index'
+# Названия групп выводятся во всех лентах, поэтому у групп
+# общее поколение, которое входит в версию любой ленты
+GROUPS_FEED = 'groups'
+
+
+def group_feed(group_id):
+    return f'group:{group_id}'
+
+
+def author_feed(author_id):
+    return f'author:{author_id}'
+
+
+def post_feed(post_id):
+    return f'post:{post_id}'
+
+
+def post_feeds(post):
+    """Ленты, в которые попадает пост."""
+    feeds = [INDEX_FEED, author_feed(post.author_id), post_feed(post.pk)]
+    if post.group_id is not None:
+        feeds.append(group_feed(post.group_id))
+    return feeds
+
+
+def version_key(feed):
+    return f'feed_version:{feed}'
+
+
+def modified_key(feed):
+    return f'feed_modified:{feed}'
+
+
+def initial_version():
+    # Счетчик, пропавший из кэша, не должен вернуться к уже
+    # использованному значению, поэтому начинаем с текущего времени
+    return int(time.time() * 1000)
+
+
+def feed_versions(*feeds):
+    keys = [version_key(feed) for feed in feeds]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, initial_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def feed_version(feed):
+    """Поколение ленты вместе с поколением групп, например '17.3'.
+
+    При чтении из отстающей реплики к версии добавляется метка:
+    '17.3:replica'.
+    """
+    version = '.'.join(map(str, feed_versions(feed, GROUPS_FEED)))
+    tag = read_tag()
+    return f'{version}:{tag}' if tag else version
+
+
+def feeds_modified(*feeds):
+    """Время последней записи в любую из лент (unix time)."""
+    keys = [modified_key(feed) for feed in feeds]
+    stamps = cache.get_many(keys)
+    if len(stamps) < len(keys):
+        # Время записи неизвестно: считаем, что запись была только что
+        now = time.time()
+        for key in keys:
+            if key not in stamps:
+                cache.add(key, now, None)
+        stamps = cache.get_many(keys)
+    return max(stamps.values(), default=time.time())
+
+
+def bump_feeds(feeds):
+    """Делает устаревшими все кэши, построенные по этим лентам."""
+    now = time.time()
+    for feed in set(feeds):
+        try:
+            cache.incr(version_key(feed))
+        except ValueError:
+            cache.set(version_key(feed), initial_version(), None)
+        cache.set(modified_key(feed), now, None)
+
+
+def count_key(feed):
+    return f'feed_count:{feed}'
+
+
+def single_flight(key, compute, timeout, version=None, serve_stale=True,
+                  cacheable=None):
+    """Значение из кэша, которое пересчитывает только один процесс.
+
+    В кэше лежит (значение, версия, срок свежести). Устаревшее значение
+    пересчитывает тот, кто первым взял блокировку; остальные в это время
+    получают старое значение (serve_stale) или ждут нового. Значение,
+    для которого cacheable вернул False, отдается без записи в кэш.
+    """
+    now = time.time()
+    entry = cache.get(key)
+    if entry is not None:
+        value, entry_version, fresh_until = entry
+        if entry_version == version and fresh_until > now:
+            return value
+        if not serve_stale:
+            entry = None
+    lock = f'{key}:lock'
+    if cache.add(lock, True, SINGLE_FLIGHT_LOCK_TIMEOUT):
+        try:
+            value = compute()
+            if cacheable is not None and not cacheable(value):
+                return value
+            cache.set(
+                key,
+                (value, version, now + timeout),
+                timeout + SINGLE_FLIGHT_STALE_TIMEOUT
+            )
+        finally:
+            cache.delete(lock)
+        return value
+    if entry is not None:
+        return entry[0]
+    deadline = now + SINGLE_FLIGHT_LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry[1] == version:
+            return entry[0]
+    return compute()
@@ -0,0 +1,99 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from yatube.replicas import REPLICA, replica_available, use_replica
+
+from .cache import GROUPS_FEED, feed_versions, feeds_modified, single_flight
+from .settings import ANONYMOUS_PAGE_TIMEOUT
+
+
+def replica_may_lag(modified):
+    """Реплика может не видеть записи, сделанной в момент modified."""
+    return (
+        replica_available()
+        and time.time() - modified < settings.REPLICA_MAX_LAG
+    )
+
+
+def anonymous_cache(get_feeds):
+    """Кэш целых страниц для анонимных читателей.
+
+    get_feeds получает аргументы представления и возвращает список лент,
+    из которых собрана страница (или None, если их не найти). Ответ
+    хранится, пока не сменятся поколения этих лент, и снабжается ETag
+    и Last-Modified; условные запросы получают 304 без рендера шаблонов.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            feeds = get_feeds(*args, **kwargs)
+            if feeds is None:
+                return view(request, *args, **kwargs)
+            feeds = [*feeds, GROUPS_FEED]
+            version = '.'.join(map(str, feed_versions(*feeds)))
+            last_modified = int(feeds_modified(*feeds))
+            if replica_may_lag(last_modified):
+                # Страницу соберет реплика: она хранится под своей меткой
+                version = f'{version}:{REPLICA}'
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            digest = hashlib.md5(f'{path}:{version}'.encode()).hexdigest()
+            etag = quote_etag(digest)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                return response
+
+            def render_page():
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+                patch_cache_control(response, public=True, max_age=0)
+                patch_vary_headers(response, ('Cookie',))
+                return response
+
+            # Страницу после записи собирает один процесс, остальные ждут
+            return single_flight(
+                f'anonymous_page:{path}',
+                render_page,
+                ANONYMOUS_PAGE_TIMEOUT,
+                version=digest,
+                serve_stale=False,
+                # Ошибки и редиректы не кэшируются
+                cacheable=lambda response: response.status_code == 200
+            )
+        return wrapper
+    return decorator
+
+
+def replica_reads(get_feeds):
+    """Чтение страницы из реплики.
+
+    Страница и ее фрагменты кэшируются под версией лент. Пока реплика
+    может отставать от последней записи в эти ленты (REPLICA_MAX_LAG),
+    версия получает метку реплики: собранное из нее не попадает
+    в кэш под новой версией без метки, а по истечении REPLICA_MAX_LAG
+    страница собирается заново.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not replica_available():
+                return view(request, *args, **kwargs)
+            feeds = get_feeds(*args, **kwargs)
+            if feeds is None:
+                return view(request, *args, **kwargs)
+            modified = feeds_modified(*feeds, GROUPS_FEED)
+            with use_replica(request, lagging=replica_may_lag(modified)):
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
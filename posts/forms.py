@@ -1,8 +1,74 @@
 from django import forms
+from django.core.exceptions import ValidationError
 from django.forms.widgets import Textarea
+from django.template.defaultfilters import filesizeformat
 from django.utils.translation import gettext_lazy as _
+from PIL import Image
 
+from .images import normalize_image
 from .models import Comment, Post
+from .settings import IMAGE_FORMATS, IMAGE_MAX_PIXELS, IMAGE_MAX_UPLOAD_SIZE
+
+
+class UploadedImageField(forms.ImageField):
+    """Картинка, проверенная по заголовку файла до полного декодирования.
+
+    Pillow при открытии читает только заголовок: по нему проверяются
+    формат и размеры, и лишь затем картинка при необходимости
+    декодируется, уменьшается и очищается от EXIF.
+    """
+
+    default_error_messages = {
+        'too_large': _('Файл слишком большой: %(size)s, можно не более '
+                       '%(limit)s.'),
+        'too_many_pixels': _('Картинка слишком большая: %(width)s×%(height)s '
+                             'точек.'),
+    }
+
+    def to_python(self, data):
+        upload = forms.FileField.to_python(self, data)
+        if upload is None:
+            return None
+        if upload.size > IMAGE_MAX_UPLOAD_SIZE:
+            raise ValidationError(
+                self.error_messages['too_large'],
+                code='too_large',
+                params={
+                    'size': filesizeformat(upload.size),
+                    'limit': filesizeformat(IMAGE_MAX_UPLOAD_SIZE),
+                }
+            )
+        try:
+            image = Image.open(upload)
+        except Exception as exc:
+            raise ValidationError(
+                self.error_messages['invalid_image'],
+                code='invalid_image',
+            ) from exc
+        if image.format not in IMAGE_FORMATS:
+            raise ValidationError(
+                self.error_messages['invalid_image'],
+                code='invalid_image',
+            )
+        width, height = image.size
+        if width * height > IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                self.error_messages['too_many_pixels'],
+                code='too_many_pixels',
+                params={'width': width, 'height': height}
+            )
+        try:
+            upload = normalize_image(upload, image)
+        except Exception as exc:
+            # Поврежденный файл Pillow может отвергнуть почти любым
+            # исключением, как и в Image.open()
+            raise ValidationError(
+                self.error_messages['invalid_image'],
+                code='invalid_image',
+            ) from exc
+        upload.image = image
+        upload.content_type = Image.MIME.get(image.format)
+        return upload
 
 
 class PostForm(forms.ModelForm):
@@ -10,6 +76,7 @@ class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('group', 'text', 'image')
+        field_classes = {'image': UploadedImageField}
         labels = {
             "text": _("Напишите о чем ваш пост"),
             "group": _("Выбeрите группу из списка"),
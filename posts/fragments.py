@@ -0,0 +1,31 @@
+import re
+
+from django.shortcuts import render
+
+# Закэшированные фрагменты общие для всех читателей. Части, зависящие
+# от читателя, оставляются в них метками и подставляются после рендера.
+VIEWER_MARKER = re.compile(r'<!--viewer:(open|edit:(\d+))-->')
+
+OPEN_POST_TEXT = 'Открыть пост'
+ADD_COMMENT_TEXT = 'Добавить комментарий'
+EDIT_POST_TEXT = 'Редактировать'
+
+
+def resolve_viewer_markers(html, user):
+    def replace(match):
+        if match.group(2) is not None:
+            is_author = int(match.group(2)) == user.id
+            return EDIT_POST_TEXT if is_author else ''
+        if user.is_authenticated:
+            return ADD_COMMENT_TEXT
+        return OPEN_POST_TEXT
+    return VIEWER_MARKER.sub(replace, html)
+
+
+def render_for_viewer(request, template_name, context):
+    """render(), который подставляет в страницу части для читателя."""
+    response = render(request, template_name, context)
+    response.content = resolve_viewer_markers(
+        response.content.decode(response.charset), request.user
+    )
+    return response
@@ -0,0 +1,56 @@
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+from .settings import IMAGE_MAX_SIDE, IMAGE_QUALITY
+
+
+def needs_normalization(image):
+    if getattr(image, 'is_animated', False):
+        # Анимацию не пересобираем, слишком большие отсекает валидация
+        return False
+    return max(image.size) > IMAGE_MAX_SIDE or bool(image.getexif())
+
+
+def verify_image(upload):
+    """Декодирует картинку из upload, чтобы найти обрезанный файл.
+
+    Image.open() читает только заголовок, verify() проверяет структуру
+    файла, но не данные JPEG и GIF — их выдает только load().
+    """
+    upload.seek(0)
+    Image.open(upload).verify()
+    upload.seek(0)
+    image = Image.open(upload)
+    if image.format == 'JPEG':
+        # Для проверки хватит самого мелкого масштаба
+        image.draft(image.mode, (1, 1))
+    image.load()
+    upload.seek(0)
+
+
+def normalize_image(upload, image):
+    """Уменьшает оригинал до IMAGE_MAX_SIDE и убирает EXIF.
+
+    image — открытая, но еще не декодированная картинка из upload.
+    Если менять нечего, проверяет, что картинка читается целиком, и
+    возвращает upload как есть.
+    """
+    if not needs_normalization(image):
+        verify_image(upload)
+        return upload
+    image_format = image.format
+    if image_format == 'JPEG':
+        # JPEG декодируется сразу в уменьшенном масштабе
+        image.draft(image.mode, (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE), Image.LANCZOS)
+    buffer = BytesIO()
+    # EXIF не передаем, поэтому в сохраненный файл он не попадает
+    image.save(buffer, image_format, quality=IMAGE_QUALITY)
+    return SimpleUploadedFile(
+        upload.name,
+        buffer.getvalue(),
+        content_type=Image.MIME[image_format]
+    )
@@ -0,0 +1,47 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.archive import archive_batch
+from posts.settings import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит посты старше заданного срока вместе с комментариями '
+        'в архивные таблицы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=ARCHIVE_AFTER_DAYS,
+            help='Переносить посты, опубликованные раньше, чем столько '
+                 'дней назад'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ARCHIVE_BATCH_SIZE,
+            help='Сколько постов переносить за одну транзакцию'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        started = time.monotonic()
+        archived = 0
+        while True:
+            # Каждая порция — отдельная короткая транзакция, поэтому
+            # запись в базу не блокируется надолго
+            moved = archive_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            archived += moved
+            self.stdout.write(f'Перенесено постов: {archived}')
+        self.stdout.write(self.style.SUCCESS(
+            f'В архив перенесено {archived} постов старше '
+            f'{cutoff:%d.%m.%Y} за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts.settings import THUMBNAIL_BATCH_SIZE
+from posts.thumbnails import enqueue_thumbnails, posts_with_images
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь превью для всех постов с картинками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=THUMBNAIL_BATCH_SIZE * 50
+        )
+
+    def handle(self, *args, **options):
+        batch = []
+        total = 0
+        sources = posts_with_images().values_list('id', 'image')
+        for source in sources.iterator():
+            batch.append(source)
+            if len(batch) >= options['batch_size']:
+                enqueue_thumbnails(batch)
+                total += len(batch)
+                batch = []
+        enqueue_thumbnails(batch)
+        total += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'В очередь поставлено постов: {total}'))
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import ArchivedPost, Post, PostImageVariant, StoredFile
+from posts.settings import MEDIA_GC_GRACE
+from posts.storage import content_storage
+
+BATCH_SIZE = 500
+
+
+def grouped_counts(queryset, field):
+    return dict(
+        queryset.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        .order_by().values_list(field).annotate(total=Count('pk'))
+    )
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы медиа, на которые не ссылается ни один пост.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Сначала пересчитать ссылки по постам и вариантам'
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=MEDIA_GC_GRACE,
+            help='Сколько секунд файл без ссылок остается на диске'
+        )
+
+    def rebuild(self):
+        references = grouped_counts(Post.objects, 'image')
+        for queryset, field in ((ArchivedPost.objects, 'image'),
+                                (PostImageVariant.objects, 'file')):
+            for name, total in grouped_counts(queryset, field).items():
+                references[name] = references.get(name, 0) + total
+        with transaction.atomic():
+            StoredFile.objects.exclude(name__in=references).update(
+                references=0)
+            for name, total in references.items():
+                StoredFile.objects.update_or_create(
+                    name=name, defaults={'references': total})
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self.rebuild()
+        released = timezone.now() - timedelta(seconds=options['grace'])
+        orphans = StoredFile.objects.filter(
+            references=0, changed__lt=released)
+        deleted = 0
+        while True:
+            batch = list(orphans.values_list('pk', 'name')[:BATCH_SIZE])
+            if not batch:
+                break
+            for pk, name in batch:
+                # Строка могла снова получить ссылку после выборки
+                if not StoredFile.objects.filter(
+                        pk=pk, references=0).delete()[0]:
+                    continue
+                # Вместе с оригиналом уходят и его превью sorl-thumbnail
+                default.kvstore.delete(ImageFile(name, content_storage))
+                content_storage.delete(name)
+                deleted += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов без ссылок: {deleted}'))
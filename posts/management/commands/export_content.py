@@ -0,0 +1,35 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import EXPORTS, FORMATS, export_stream
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии, группы, пользователей и список '
+        'медиафайлов в сжатые gzip файлы JSONL или CSV, не загружая '
+        'таблицы в память целиком.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kinds', nargs='*',
+            help=f'Что выгружать: {", ".join(EXPORTS)}; по умолчанию все'
+        )
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--output-dir', default='.')
+
+    def handle(self, *args, **options):
+        unknown = set(options['kinds']) - set(EXPORTS)
+        if unknown:
+            raise CommandError(f'Неизвестные выгрузки: {", ".join(unknown)}')
+        os.makedirs(options['output_dir'], exist_ok=True)
+        for kind in options['kinds'] or EXPORTS:
+            path = os.path.join(
+                options['output_dir'], f'{kind}.{options["format"]}.gz')
+            with open(path, 'wb') as output:
+                for chunk in export_stream(kind, options['format']):
+                    output.write(chunk)
+            self.stdout.write(self.style.SUCCESS(
+                f'{path}: {os.path.getsize(path)} байт'))
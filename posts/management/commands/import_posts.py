@@ -0,0 +1,352 @@
+import csv
+import gzip
+import json
+import os
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.cache import (GROUPS_FEED, INDEX_FEED, author_feed, bump_feeds,
+                         group_feed, post_feed)
+from posts.models import (ArchivedComment, ArchivedPost, Comment, Follow,
+                          Group, Post, User)
+from posts.settings import IMPORT_BATCH_SIZE
+from posts.timeline import backfill_timeline
+
+FORMATS = ('jsonl', 'csv')
+# Поля, по которым строка в базе узнается как вставленная импортом
+POST_KEY = ('id', 'author_id', 'text')
+COMMENT_KEY = ('id', 'post_id', 'author_id', 'text')
+
+
+class RecordError(ValueError):
+    pass
+
+
+class IdConflict(Exception):
+    """Заранее назначенные id заняты строками, созданными не импортом."""
+
+
+@contextmanager
+def historical_dates():
+    """Отключает auto_now: даты берутся из импортируемых записей."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Post._meta.get_field('updated'),
+        Comment._meta.get_field('created'),
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def read_records(path, file_format):
+    # Файлы export_content сжаты gzip, их читаем как есть
+    opener = gzip.open if path.lower().endswith('.gz') else open
+    with opener(path, 'rt', newline='', encoding='utf-8') as source:
+        if file_format == 'csv':
+            yield from csv.DictReader(source)
+            return
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+def parse_date(value):
+    moment = parse_datetime(value or '')
+    if moment is None:
+        raise RecordError(f'неверная дата {value!r}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.utc)
+    return moment
+
+
+def next_id(*models):
+    # id постов и комментариев из архива тоже заняты
+    return max(
+        model.objects.aggregate(last=Max('id'))['last'] or 0
+        for model in models
+    ) + 1
+
+
+def insert_rows(model, archive, rows, fields):
+    """Вставляет строки пачки с заранее назначенными id.
+
+    Если пачку уже вставил прошлый запуск, упавший до контрольной
+    точки, ничего не делает. Если id заняты чужими строками, поднимает
+    IdConflict.
+    """
+    ids = [row.id for row in rows]
+    if archive.objects.filter(id__in=ids).exists():
+        raise IdConflict
+    found = set(model.objects.filter(id__in=ids).values_list(*fields))
+    if not found:
+        model.objects.bulk_create(rows)
+        return
+    expected = {tuple(getattr(row, field) for field in fields) for row in rows}
+    if found != expected:
+        raise IdConflict
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты и комментарии из JSONL или CSV пачками '
+        'bulk_create. Запись поста: type=post, id (внешний), text, '
+        'pub_date, author (username), group (slug). Комментария: '
+        'type=comment, post (внешний id поста), text, created, author. '
+        'Файлы export_content (и сжатые .gz) импортируются как есть: '
+        'сначала посты, затем комментарии с тем же --id-map. '
+        'Прерванный импорт продолжается с последней контрольной точки. '
+        'id новым строкам назначаются заранее; если их займут посты, '
+        'созданные во время импорта, пачка получает новые id.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки, по умолчанию <path>.checkpoint'
+        )
+        parser.add_argument(
+            '--id-map',
+            help='Файл соответствия внешних id постов новым, по умолчанию '
+                 '<checkpoint>.posts; укажите один и тот же для файла '
+                 'постов и файла комментариев'
+        )
+        parser.add_argument(
+            '--create-authors',
+            action='store_true',
+            help='Создавать пользователей для неизвестных авторов'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        name = path.lower()
+        if name.endswith('.gz'):
+            name = name[:-len('.gz')]
+        file_format = options['format'] or (
+            'csv' if name.endswith('.csv') else 'jsonl')
+        self.checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        self.id_map = options['id_map'] or f'{self.checkpoint}.posts'
+        self.create_authors = options['create_authors']
+        self.state = self.load_checkpoint(path)
+        self.post_ids = self.load_post_ids()
+        self.authors = dict(User.objects.values_list('username', 'id'))
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        self.touched_authors = set()
+        self.touched_groups = set()
+        self.imported = self.errors = 0
+        self.started = time.monotonic()
+        records = islice(
+            read_records(path, file_format), self.state['position'], None)
+        while True:
+            batch = list(islice(records, options['batch_size']))
+            if not batch:
+                break
+            self.import_batch(batch)
+        self.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано записей: {self.imported}, '
+            f'пропущено с ошибками: {self.errors}, {self.rate()}'
+        ))
+
+    def load_checkpoint(self, path):
+        if os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as checkpoint:
+                state = json.load(checkpoint)
+            if state['source'] != os.path.abspath(path):
+                raise CommandError(
+                    f'Контрольная точка {self.checkpoint} относится '
+                    f'к другому файлу: {state["source"]}')
+            self.stdout.write(f'Продолжаем с записи {state["position"]}')
+            return state
+        return {
+            'source': os.path.abspath(path),
+            'position': 0,
+            'next_post_id': next_id(Post, ArchivedPost),
+            'next_comment_id': next_id(Comment, ArchivedComment),
+        }
+
+    def load_post_ids(self):
+        post_ids = {}
+        if os.path.exists(self.id_map):
+            with open(self.id_map) as pairs:
+                for line in pairs:
+                    external_id, post_id = line.rstrip('\n').split('\t')
+                    post_ids[external_id] = int(post_id)
+        return post_ids
+
+    def save_checkpoint(self, state, new_post_ids):
+        # Сначала соответствие id, потом позиция: если упасть между
+        # ними, пачка повторится с теми же id и ничего не задвоит
+        with open(self.id_map, 'a') as pairs:
+            for external_id, post_id in new_post_ids.items():
+                pairs.write(f'{external_id}\t{post_id}\n')
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'w') as checkpoint:
+            json.dump(state, checkpoint)
+        os.replace(temporary, self.checkpoint)
+
+    def author_id(self, username):
+        if not username:
+            raise RecordError('не указан автор')
+        if username not in self.authors:
+            raise RecordError(f'неизвестный автор {username!r}')
+        return self.authors[username]
+
+    def ensure_authors(self, batch):
+        if not self.create_authors:
+            return
+        missing = {
+            record.get('author') for record in batch
+        } - set(self.authors) - {None, ''}
+        if not missing:
+            return
+        User.objects.bulk_create(
+            [
+                User(username=username, password=make_password(None))
+                for username in missing
+            ],
+            ignore_conflicts=True
+        )
+        self.authors.update(User.objects.filter(
+            username__in=missing).values_list('username', 'id'))
+
+    def build_post(self, record, state, new_post_ids):
+        group_id = None
+        if record.get('group'):
+            group_id = self.groups.get(record['group'])
+            if group_id is None:
+                raise RecordError(f'неизвестная группа {record["group"]!r}')
+        pub_date = parse_date(record.get('pub_date'))
+        post = Post(
+            id=state['next_post_id'],
+            text=record.get('text') or '',
+            pub_date=pub_date,
+            updated=pub_date,
+            author_id=self.author_id(record.get('author')),
+            group_id=group_id
+        )
+        state['next_post_id'] += 1
+        if record.get('id') not in (None, ''):
+            new_post_ids[str(record['id'])] = post.id
+        self.touched_authors.add(post.author_id)
+        self.touched_groups.add(group_id)
+        return post
+
+    def build_comment(self, record, state, new_post_ids):
+        external_id = str(record.get('post'))
+        post_id = new_post_ids.get(external_id) or self.post_ids.get(
+            external_id)
+        if post_id is None:
+            raise RecordError(f'неизвестный пост {external_id!r}')
+        comment = Comment(
+            id=state['next_comment_id'],
+            post_id=post_id,
+            author_id=self.author_id(record.get('author')),
+            text=record.get('text') or '',
+            created=parse_date(record.get('created'))
+        )
+        state['next_comment_id'] += 1
+        return comment
+
+    def build_batch(self, batch):
+        state = dict(self.state)
+        new_post_ids = {}
+        posts, comments, errors = [], [], []
+        for index, record in enumerate(batch, start=state['position'] + 1):
+            try:
+                if record.get('type', 'post') == 'comment':
+                    comments.append(
+                        self.build_comment(record, state, new_post_ids))
+                else:
+                    posts.append(
+                        self.build_post(record, state, new_post_ids))
+            except RecordError as error:
+                errors.append(f'Запись {index}: {error}')
+        state['position'] += len(batch)
+        return state, new_post_ids, posts, comments, errors
+
+    def skip_taken_ids(self):
+        # Пока шел импорт, сайт создал посты или комментарии с id,
+        # назначенными пачке: пачка получит id после них
+        self.state['next_post_id'] = max(
+            self.state['next_post_id'], next_id(Post, ArchivedPost))
+        self.state['next_comment_id'] = max(
+            self.state['next_comment_id'], next_id(Comment, ArchivedComment))
+        # Новые id записываются сразу: если упасть после commit
+        # пачки, повтор узнает ее по ним
+        self.save_checkpoint(self.state, {})
+        self.stderr.write(
+            f'id заняты, пачка получает id с {self.state["next_post_id"]}')
+
+    def import_batch(self, batch):
+        self.ensure_authors(batch)
+        while True:
+            state, new_post_ids, posts, comments, errors = (
+                self.build_batch(batch))
+            try:
+                with transaction.atomic(), historical_dates():
+                    insert_rows(Post, ArchivedPost, posts, POST_KEY)
+                    insert_rows(
+                        Comment, ArchivedComment, comments, COMMENT_KEY)
+            except IdConflict:
+                self.skip_taken_ids()
+            else:
+                break
+        for error in errors:
+            self.stderr.write(error)
+        self.errors += len(errors)
+        self.save_checkpoint(state, new_post_ids)
+        self.post_ids.update(new_post_ids)
+        self.state = state
+        self.imported += len(posts) + len(comments)
+        bump_feeds({post_feed(comment.post_id) for comment in comments})
+        self.stdout.write(
+            f'Позиция {state["position"]}: {self.imported} записей, '
+            f'{self.rate()}'
+        )
+
+    def rate(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return f'{self.imported / elapsed:.0f} записей в секунду'
+
+    def rebuild_timelines(self):
+        """Раскладывает импортированные посты по лентам подписчиков."""
+        follows = Follow.objects.filter(
+            author_id__in=self.touched_authors
+        ).values_list('user_id', 'author_id')
+        for follower_id, author_id in follows.iterator():
+            backfill_timeline(follower_id, author_id)
+
+    def rebuild(self):
+        """Пересчитывает счетчики, поиск, ленты подписок и кэши лент."""
+        if not self.state['position']:
+            return
+        call_command('rebuild_author_stats', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        self.rebuild_timelines()
+        bump_feeds(
+            [INDEX_FEED, GROUPS_FEED]
+            + [author_feed(author_id) for author_id in self.touched_authors]
+            + [
+                group_feed(group_id) for group_id in self.touched_groups
+                if group_id is not None
+            ]
+        )
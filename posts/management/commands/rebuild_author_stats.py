@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import (ArchivedComment, ArchivedPost, AuthorStats,
+                          Comment, Follow, Post, User)
+
+BATCH_SIZE = 1000
+
+
+def grouped_counts(queryset, field):
+    return dict(
+        queryset.order_by().values_list(field).annotate(total=Count('pk'))
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики авторов (AuthorStats) с нуля.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            posts = grouped_counts(Post.objects, 'author_id')
+            archived = grouped_counts(ArchivedPost.objects, 'author_id')
+            comments = grouped_counts(Comment.objects, 'author_id')
+            archived_comments = grouped_counts(
+                ArchivedComment.objects, 'author_id')
+            followers = grouped_counts(Follow.objects, 'author_id')
+            following = grouped_counts(Follow.objects, 'user_id')
+            # Признак не пересчитать по таблицам: он помнит посты,
+            # которые не попали в ленты подписчиков
+            read_on_demand = set(
+                AuthorStats.objects.filter(read_on_demand=True)
+                .values_list('author_id', flat=True)
+            )
+            AuthorStats.objects.all().delete()
+            AuthorStats.objects.bulk_create(
+                (
+                    AuthorStats(
+                        author_id=author_id,
+                        posts_count=(
+                            posts.get(author_id, 0)
+                            + archived.get(author_id, 0)
+                        ),
+                        archived_posts_count=archived.get(author_id, 0),
+                        comments_count=(
+                            comments.get(author_id, 0)
+                            + archived_comments.get(author_id, 0)
+                        ),
+                        followers_count=followers.get(author_id, 0),
+                        following_count=following.get(author_id, 0),
+                        read_on_demand=author_id in read_on_demand,
+                    )
+                    for author_id in User.objects.values_list(
+                        'pk', flat=True).iterator()
+                ),
+                batch_size=BATCH_SIZE
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Счетчики пересчитаны для {AuthorStats.objects.count()} авторов'
+        ))
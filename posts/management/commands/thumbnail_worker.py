@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.settings import THUMBNAIL_BATCH_SIZE, THUMBNAIL_POLL_INTERVAL
+from posts.thumbnails import process_thumbnail_jobs
+
+
+class Command(BaseCommand):
+    help = 'Генерирует превью картинок из очереди ThumbnailJob.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Разобрать очередь и выйти, не дожидаясь новых задач.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=THUMBNAIL_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        done = 0
+        while True:
+            processed = process_thumbnail_jobs(options['batch_size'])
+            done += processed
+            if processed:
+                continue
+            if options['once']:
+                break
+            time.sleep(THUMBNAIL_POLL_INTERVAL)
+        self.stdout.write(self.style.SUCCESS(f'Обработано задач: {done}'))
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.28 on 2026-10-18 22:30
+
+from django.db import migrations, models
+import posts.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_postimagevariant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('references', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Ссылок')),
+                ('changed', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Хранимый файл',
+                'verbose_name_plural': 'Хранимые файлы',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Загрузите картинку', null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/'),
+        ),
+        migrations.AlterField(
+            model_name='postimagevariant',
+            name='file',
+            field=models.ImageField(storage=posts.storage.ContentAddressedStorage(), upload_to='posts/variants/', verbose_name='Файл'),
+        ),
+    ]
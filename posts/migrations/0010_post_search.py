@@ -0,0 +1,22 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_storedfile'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE posts_post_search USING fts5("
+                "text, tokenize='unicode61 remove_diacritics 2')",
+                "INSERT INTO posts_post_search (rowid, text) "
+                "SELECT id, text FROM posts_post",
+            ],
+            reverse_sql="DROP TABLE posts_post_search",
+        ),
+    ]
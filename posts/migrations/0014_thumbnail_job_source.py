@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='source',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Картинка'),
+        ),
+    ]
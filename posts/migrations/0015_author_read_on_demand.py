@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:21
+
+from django.db import migrations, models
+
+from posts.settings import FANOUT_MAX_FOLLOWERS
+
+
+def mark_celebrities(apps, schema_editor):
+    # Посты нынешних популярных авторов уже не разложены по лентам
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    AuthorStats.objects.filter(
+        followers_count__gte=FANOUT_MAX_FOLLOWERS
+    ).update(read_on_demand=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_thumbnail_job_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='read_on_demand',
+            field=models.BooleanField(default=False, verbose_name='Посты подмешиваются при чтении'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
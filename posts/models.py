@@ -1,8 +1,33 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from .storage import content_storage
 
 User = get_user_model()
 
+# Поля, которые нужны шаблону post_item.html при выводе ленты
+FEED_FIELDS = (
+    'id',
+    'text',
+    'pub_date',
+    'updated',
+    'image',
+    'author__id',
+    'author__username',
+    'group__id',
+    'group__slug',
+    'group__title',
+)
+
+
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Посты для ленты: автор и группа одним JOIN, только нужные поля."""
+        return self.select_related('author', 'group').only(
+            *FEED_FIELDS
+        ).prefetch_related('image_variants')
+
 
 class Post(models.Model):
     text = models.TextField(
@@ -15,6 +40,10 @@ class Post(models.Model):
         verbose_name='Дата публикации',
         db_index=True
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -32,18 +61,38 @@ class Post(models.Model):
     )
     image = models.ImageField(
         upload_to='posts/',
+        storage=content_storage,
         blank=True,
         null=True,
         help_text='Загрузите картинку'
     )
 
+    objects = PostQuerySet.as_manager()
+    # Шаблоны отличают архивные посты: их нельзя редактировать
+    is_archived = False
+
     def __str__(self):
         return f'{self.text[:15]}'
 
+    def save(self, *args, **kwargs):
+        # Счетчики автора обновляются в той же транзакции, что и пост
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты группы и автора: фильтр по группе или автору и порядок
+        # (-pub_date, -id) целиком из индекса, без сортировки
+        indexes = [
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx'),
+        ]
 
 
 class Group(models.Model):
@@ -68,10 +117,12 @@ class Group(models.Model):
 
 
 class Comment(models.Model):
+    # Отдельный индекс по post не нужен: его заменяет comment_post_feed_idx
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
-        related_name='comments'
+        related_name='comments',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -86,8 +137,359 @@ class Comment(models.Model):
         verbose_name='Дата и время публикации'
     )
 
+    def __str__(self):
+        return self.text
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_feed_idx'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счетчики автора для боковой панели профиля."""
+
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Записей'
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Комментариев'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок'
+    )
+    # Входят и в posts_count; профиль по нему решает, читать ли архив
+    archived_posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Записей в архиве'
+    )
+    # Не все посты автора разложены по лентам подписчиков (см.
+    # posts.timeline): их подмешивают при чтении, даже когда
+    # подписчиков снова стало меньше FANOUT_MAX_FOLLOWERS
+    read_on_demand = models.BooleanField(
+        default=False,
+        verbose_name='Посты подмешиваются при чтении'
+    )
+
+    def __str__(self):
+        return f'{self.author}: {self.posts_count}'
+
+    @classmethod
+    def get_for(cls, author):
+        """Счетчики автора; отсутствующая запись пересчитывается."""
+        try:
+            return author.stats
+        except cls.DoesNotExist:
+            # Посты и комментарии из архива входят в общие счетчики
+            archived = ArchivedPost.objects.filter(author=author).count()
+            comments = (
+                Comment.objects.filter(author=author).count()
+                + ArchivedComment.objects.filter(author=author).count()
+            )
+            stats, _ = cls.objects.get_or_create(author=author, defaults={
+                'posts_count': Post.objects.filter(
+                    author=author).count() + archived,
+                'archived_posts_count': archived,
+                'comments_count': comments,
+                'followers_count': Follow.objects.filter(
+                    author=author).count(),
+                'following_count': Follow.objects.filter(
+                    user=author).count(),
+            })
+            return stats
+
+    @classmethod
+    def change(cls, author_id, **deltas):
+        cls.objects.filter(author_id=author_id).update(**{
+            field: models.F(field) + delta
+            for field, delta in deltas.items()
+        })
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+
+class ThumbnailJob(models.Model):
+    """Задача на генерацию превью картинки поста."""
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='thumbnail_job',
+        verbose_name='Пост'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата постановки в очередь'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток'
+    )
+    source = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Картинка'
+    )
+
+    def __str__(self):
+        return f'Превью для поста {self.post_id}'
+
+    class Meta:
+        ordering = ('created',)
+        verbose_name = 'Задача на превью'
+        verbose_name_plural = 'Задачи на превью'
+
+
+class PostImageVariant(models.Model):
+    """Уменьшенная копия картинки поста в одном формате и ширине."""
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_variants',
+        verbose_name='Пост'
+    )
+    file = models.ImageField(
+        upload_to='posts/variants/',
+        storage=content_storage,
+        verbose_name='Файл'
+    )
+    format = models.CharField(
+        max_length=10,
+        verbose_name='Формат'
+    )
+    width = models.PositiveIntegerField(verbose_name='Ширина')
+    height = models.PositiveIntegerField(verbose_name='Высота')
+
+    def __str__(self):
+        return f'{self.post_id}: {self.width}w {self.format}'
+
+    @property
+    def mime_type(self):
+        return f'image/{self.format.lower()}'
+
+    class Meta:
+        ordering = ('width',)
+        verbose_name = 'Вариант картинки'
+        verbose_name_plural = 'Варианты картинок'
+
+
+class StoredFile(models.Model):
+    """Число ссылок на файл из ContentAddressedStorage."""
+
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Файл'
+    )
+    references = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        verbose_name='Ссылок'
+    )
+    changed = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    def __str__(self):
+        return f'{self.name}: {self.references}'
+
+    @classmethod
+    def change(cls, name, delta):
+        if not name:
+            return
+        files = cls.objects.filter(name=name)
+        if delta < 0:
+            files = files.filter(references__gte=-delta)
+        changed = files.update(
+            references=models.F('references') + delta,
+            changed=timezone.now()
+        )
+        if changed:
+            return
+        if delta > 0:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(name=name, references=delta)
+            except IntegrityError:
+                cls.change(name, delta)
+
+    class Meta:
+        verbose_name = 'Хранимый файл'
+        verbose_name_plural = 'Хранимые файлы'
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follower',
+        verbose_name='Подписчик'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        verbose_name='Автор'
+    )
+
+    def __str__(self):
+        return f'{self.user} → {self.author}'
+
+    class Meta:
+        verbose_name = 'Подписка'
+        verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='no_self_follow'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок читателя (fan-out on write).
+
+    Дата публикации скопирована из поста: лента читается одним
+    проходом по индексу (follower, pub_date, post) без join.
+    """
+
+    follower = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    def __str__(self):
+        return f'{self.follower}: {self.post_id}'
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['follower', 'post'], name='unique_timeline_post'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['follower', '-pub_date', '-post'],
+                name='timeline_range_idx'),
+        ]
+
+
+class ArchivedPost(models.Model):
+    """Старый пост, перенесенный из горячей таблицы командой archive_posts.
+
+    id остается прежним, поэтому адрес поста не меняется.
+    """
+
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField(verbose_name='Текст')
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+    updated = models.DateTimeField(verbose_name='Дата изменения')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        verbose_name='Автор'
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        verbose_name='Группа',
+        blank=True,
+        null=True
+    )
+    image = models.ImageField(
+        upload_to='posts/',
+        storage=content_storage,
+        blank=True,
+        null=True
+    )
+
+    is_archived = True
+
+    def __str__(self):
+        return f'{self.text[:15]}'
+
+    @property
+    def image_variants(self):
+        # Варианты картинки при переносе удаляются,
+        # шаблон выводит превью sorl-thumbnail
+        return PostImageVariant.objects.none()
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Пост в архиве'
+        verbose_name_plural = 'Посты в архиве'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='archived_post_author_idx'),
+        ]
+
+
+class ArchivedComment(models.Model):
+    """Комментарий к посту из архива."""
+
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        db_index=False
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments'
+    )
+    text = models.TextField()
+    created = models.DateTimeField(
+        verbose_name='Дата и время публикации'
+    )
+
     def __str__(self):
         return self.text
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='archived_comment_post_idx'),
+        ]
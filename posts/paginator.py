@@ -0,0 +1,219 @@
+import base64
+import json
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .cache import count_key, feed_version, single_flight
+from .settings import FEED_COUNT_TIMEOUT, PAGE_SIZE, PAGE_WINDOW
+
+AFTER = 'after'
+BEFORE = 'before'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps([values[0].isoformat(), values[1]])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        moment, pk = json.loads(raw.decode())
+        moment = parse_datetime(moment)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise InvalidCursor(token)
+    if moment is None or not isinstance(pk, int):
+        raise InvalidCursor(token)
+    return moment, pk
+
+
+class WindowPage(Page):
+    is_cursor = False
+
+    @cached_property
+    def next_cursor(self):
+        """Курсор ?after= за последним постом страницы или None.
+
+        По нему следующая страница читается без OFFSET; ленты, которые
+        не queryset, листаются только по номерам.
+        """
+        if not self.paginator.keyset or not self.has_next():
+            return None
+        last = self[len(self) - 1]
+        return encode_cursor([last.pub_date, last.id])
+
+    @property
+    def page_window(self):
+        """Номера страниц вокруг текущей плюс первая и последняя.
+
+        Пропуски обозначены None.
+        """
+        last = self.paginator.num_pages
+        start = max(self.number - PAGE_WINDOW, 1)
+        end = min(self.number + PAGE_WINDOW, last)
+        window = list(range(start, end + 1))
+        if start > 1:
+            window = [1] + ([None] if start > 2 else []) + window
+        if end < last:
+            window += ([None] if end < last - 1 else []) + [last]
+        return window
+
+
+class FeedPaginator(Paginator):
+    """Паджинатор ленты с закэшированным числом постов.
+
+    Кэш сбрасывается при записи постов (см. posts.signals).
+    """
+
+    def __init__(self, object_list, per_page, feed=None):
+        self.keyset = isinstance(object_list, QuerySet)
+        if self.keyset:
+            # Тот же порядок, что у курсоров: страница по номеру
+            # и следующая за ней по курсору стыкуются без пропусков
+            object_list = object_list.order_by('-pub_date', '-id')
+        super().__init__(object_list, per_page)
+        self.feed = feed
+
+    @cached_property
+    def count(self):
+        if self.feed is None:
+            return super().count
+        # Пока один процесс пересчитывает число постов после записи,
+        # остальные показывают прежнее
+        return single_flight(
+            count_key(self.feed),
+            lambda: Paginator.count.func(self),
+            FEED_COUNT_TIMEOUT,
+            version=feed_version(self.feed)
+        )
+
+    def _get_page(self, *args, **kwargs):
+        return WindowPage(*args, **kwargs)
+
+
+class CursorPage(Page):
+    """Страница, построенная по ключу (дата, id) без COUNT и OFFSET."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return (
+            f'<Cursor page {self.previous_cursor}..{self.next_cursor}>'
+        )
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator(Paginator):
+    """Keyset-паджинатор по паре полей (дата, id).
+
+    По умолчанию идет от новых записей к старым, как лента постов.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id')):
+        super().__init__(object_list, per_page)
+        self.ordering = ordering
+        self.descending = ordering[0].startswith('-')
+        self.fields = [name.lstrip('-') for name in ordering]
+
+    encode_cursor = staticmethod(encode_cursor)
+    decode_cursor = staticmethod(decode_cursor)
+
+    def _seek(self, queryset, cursor, forward, fields=None):
+        moment, pk = cursor
+        first, second = fields or self.fields
+        lookup = 'lt' if forward == self.descending else 'gt'
+        return queryset.filter(
+            Q(**{f'{first}__{lookup}': moment})
+            | Q(**{first: moment, f'{second}__{lookup}': pk})
+        )
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def _key(self, obj):
+        return [getattr(obj, name) for name in self.fields]
+
+    def _items(self, cursor, forward):
+        """До per_page + 1 записей за курсором в порядке обхода."""
+        queryset = self.object_list
+        if cursor is not None:
+            queryset = self._seek(queryset, cursor, forward)
+        if forward:
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        return list(queryset[:self.per_page + 1])
+
+    def get_page(self, after=None, before=None):
+        forward = before is None
+        cursor = after if forward else before
+        if cursor is not None:
+            cursor = self.decode_cursor(cursor)
+        items = self._items(cursor, forward)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if not forward:
+            items.reverse()
+        next_cursor = previous_cursor = None
+        if items:
+            if (has_more if forward else before is not None):
+                next_cursor = self.encode_cursor(self._key(items[-1]))
+            if (after is not None if forward else has_more):
+                previous_cursor = self.encode_cursor(self._key(items[0]))
+        return CursorPage(items, self, next_cursor, previous_cursor)
+
+
+def cursor_paginate(request, object_list, per_page,
+                    ordering=('-pub_date', '-id')):
+    """Keyset-страница по ?after= или ?before=.
+
+    Для испорченного курсора поднимает InvalidCursor.
+    """
+    after = request.GET.get(AFTER) or None
+    before = None if after else request.GET.get(BEFORE) or None
+    return CursorPaginator(object_list, per_page, ordering).get_page(
+        after=after, before=before)
+
+
+def paginate(request, object_list, feed=None, per_page=PAGE_SIZE):
+    """Возвращает страницу ленты.
+
+    Если в запросе есть ?after= или ?before=, используется keyset-режим,
+    иначе — обычная постраничная навигация по ?page=. Ссылка «Следующая»
+    со страницы по номеру ведет в keyset-режим (page.next_cursor), так
+    что дальние страницы читаются без OFFSET. Ленты, которые не
+    queryset (горячие посты вместе с архивом), листаются только по
+    номерам страниц.
+    """
+    keyset = isinstance(object_list, QuerySet)
+    if keyset and (request.GET.get(AFTER) or request.GET.get(BEFORE)):
+        try:
+            return cursor_paginate(request, object_list, per_page)
+        except InvalidCursor:
+            pass
+    paginator = FeedPaginator(object_list, per_page, feed)
+    return paginator.get_page(request.GET.get('page'))
@@ -0,0 +1,159 @@
+"""Полнотекстовый поиск по постам через виртуальную таблицу FTS5.
+
+Таблица posts_post_search создается миграцией 0010; rowid в ней
+совпадает с id поста. Сигналы (posts.signals) обновляют ее при
+сохранении и удалении постов.
+"""
+import base64
+import json
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .paginator import CursorPaginator, InvalidCursor
+from .settings import SEARCH_MAX_TERMS, SEARCH_SNIPPET_TOKENS
+
+TABLE = 'posts_post_search'
+# Управляющие символы не встречаются в тексте постов: ими FTS5 отмечает
+# найденные слова, а после экранирования они меняются на <mark>
+MARK_OPEN = '\x02'
+MARK_CLOSE = '\x03'
+
+
+def match_expression(query):
+    """Запрос пользователя в виде выражения FTS5 или None.
+
+    Каждое слово ищется как префикс, все слова должны встретиться.
+    Кавычки и операторы FTS5 из запроса отбрасываются.
+    """
+    terms = re.findall(r'\w+', query.lower())[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text]
+        )
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_index():
+    """Заполняет индекс заново по всем постам."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text) '
+            f'SELECT id, text FROM posts_post'
+        )
+
+
+def search_filter(queryset, query):
+    """Оставляет в queryset только посты, найденные по индексу."""
+    expression = match_expression(query)
+    if expression is None:
+        return queryset.none()
+    # RawSQL в pk__in оборачивается в лишние скобки, и SQLite берет
+    # только первую строку подзапроса, поэтому условие пишем целиком
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        where=[
+            f'"{table}"."id" IN '
+            f'(SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s)'
+        ],
+        params=[expression]
+    )
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_OPEN, '<mark>')
+        .replace(MARK_CLOSE, '</mark>')
+    )
+
+
+def encode_rank_cursor(values):
+    raw = json.dumps([float(values[0]), values[1]])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_rank_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        rank, pk = json.loads(raw.decode())
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise InvalidCursor(token)
+    if not isinstance(rank, (int, float)) or not isinstance(pk, int):
+        raise InvalidCursor(token)
+    return rank, pk
+
+
+class SearchPaginator(CursorPaginator):
+    """Keyset-паджинатор результатов поиска по паре (релевантность, id).
+
+    Чем меньше bm25, тем выше пост в выдаче. Посты приходят из
+    Post.objects.feed() с полями search_rank и search_snippet.
+    """
+
+    encode_cursor = staticmethod(encode_rank_cursor)
+    decode_cursor = staticmethod(decode_rank_cursor)
+
+    def __init__(self, expression, per_page):
+        super().__init__(expression, per_page, ordering=('rank', 'id'))
+        self.fields = ['search_rank', 'id']
+
+    def _items(self, cursor, forward):
+        sql = (
+            f'SELECT rowid, rank, snippet({TABLE}, 0, %s, %s, %s, %s) '
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s'
+        )
+        params = [
+            MARK_OPEN, MARK_CLOSE, '…', SEARCH_SNIPPET_TOKENS,
+            self.object_list
+        ]
+        if cursor is not None:
+            rank, pk = cursor
+            lookup = '>' if forward else '<'
+            sql += (
+                f' AND (rank {lookup} %s OR (rank = %s AND rowid {lookup} %s))'
+            )
+            params += [rank, rank, pk]
+        direction = 'ASC' if forward else 'DESC'
+        sql += f' ORDER BY rank {direction}, rowid {direction} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            rows = db_cursor.fetchall()
+        posts = Post.objects.feed().in_bulk([row[0] for row in rows])
+        items = []
+        for pk, rank, snippet in rows:
+            # Пост могли удалить между двумя запросами
+            post = posts.get(pk)
+            if post is not None:
+                post.search_rank = rank
+                post.search_snippet = highlight(snippet)
+                items.append(post)
+        return items
+
+
+def search_posts(query, per_page, after=None, before=None):
+    """Страница результатов поиска или None для пустого запроса.
+
+    Для испорченного курсора поднимает InvalidCursor.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return None
+    return SearchPaginator(expression, per_page).get_page(
+        after=after, before=before)
@@ -1,3 +1,89 @@
 DATE_FORMAT = "%d/%m/%Y %H:%M"
 
 PAGE_SIZE = 10
+
+# Сколько номеров страниц показывать по обе стороны от текущей
+PAGE_WINDOW = 2
+
+# Время жизни закэшированного числа постов в ленте, секунд
+FEED_COUNT_TIMEOUT = 60 * 60
+
+# Время жизни закэшированных страниц для анонимных читателей, секунд
+ANONYMOUS_PAGE_TIMEOUT = 60 * 60
+
+# Пересчет значения в кэше одним процессом (posts.cache.single_flight):
+# сколько держится блокировка, как часто ждущие проверяют кэш
+# и сколько после устаревания значение еще можно отдавать, секунд
+SINGLE_FLIGHT_LOCK_TIMEOUT = 10
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+SINGLE_FLIGHT_STALE_TIMEOUT = 60 * 60
+
+# Сколько комментариев выводить за один раз
+COMMENTS_PAGE_SIZE = 20
+
+# Превью, которые используют шаблоны: геометрия и опции sorl-thumbnail.
+# Должны совпадать с тегами {% thumbnail %} в post_picture.html
+THUMBNAIL_GEOMETRIES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+# Очередь генерации превью: сколько задач брать за раз, пауза между
+# проверками очереди, секунд, и число попыток для одной задачи
+THUMBNAIL_BATCH_SIZE = 20
+THUMBNAIL_POLL_INTERVAL = 2
+THUMBNAIL_MAX_ATTEMPTS = 3
+
+# Варианты картинки поста для srcset: ширины, пропорции кадра
+# (как у превью 960x339) и форматы в порядке предпочтения.
+# Последний формат — запасной для <img>, он есть в любом Pillow.
+# AVIF Pillow сохраняет только с pillow-avif-plugin, без него формат
+# пропускается
+IMAGE_VARIANT_WIDTHS = (320, 640, 960)
+IMAGE_VARIANT_RATIO = (960, 339)
+IMAGE_VARIANT_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+IMAGE_VARIANT_QUALITY = 80
+
+# Ограничения для загружаемых картинок: размер файла, байт; число
+# пикселей (защита от «бомб» — маленьких файлов с огромной картинкой);
+# наибольшая сторона хранимого оригинала и допустимые форматы
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+IMAGE_MAX_SIDE = 2560
+IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+IMAGE_QUALITY = 85
+
+# collect_media не трогает файлы, которые лишились ссылок недавно:
+# их в этот момент может заново загружать другой пост (секунды)
+MEDIA_GC_GRACE = 60 * 60
+
+# Поиск: длина фрагмента с подсветкой (в словах) и число слов запроса,
+# которые учитываются при поиске
+SEARCH_SNIPPET_TOKENS = 24
+SEARCH_MAX_TERMS = 8
+
+# Лента подписок: сколько постов хранится у каждого читателя; у авторов
+# с числом подписчиков от FANOUT_MAX_FOLLOWERS посты не раскладываются
+# по лентам при записи, а подмешиваются при чтении
+TIMELINE_LENGTH = 800
+# Ленту обрезаем, только когда она переросла TIMELINE_LENGTH на столько
+# постов: иначе каждый новый пост удалял бы по записи у всех подписчиков
+TIMELINE_TRIM_SLACK = 100
+FANOUT_MAX_FOLLOWERS = 1000
+FANOUT_BATCH_SIZE = 500
+
+# Сколько последних постов отдавать в RSS, Atom и JSON Feed
+SYNDICATION_ITEMS = 50
+
+# Наибольший размер страницы JSON API (?limit=)
+API_MAX_PAGE_SIZE = 100
+
+# Импорт постов (import_posts): сколько записей вставлять за транзакцию
+IMPORT_BATCH_SIZE = 1000
+
+# Выгрузка (export_content и /export/): строк в одном запросе к базе
+EXPORT_CHUNK_SIZE = 2000
+
+# Архив (archive_posts): посты старше ARCHIVE_AFTER_DAYS дней переносятся
+# в архивные таблицы порциями по ARCHIVE_BATCH_SIZE постов
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
@@ -0,0 +1,167 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import (GROUPS_FEED, author_feed, bump_feeds, post_feed,
+                    post_feeds)
+from .models import (ArchivedComment, ArchivedPost, AuthorStats, Comment,
+                     Follow, Group, Post, PostImageVariant, StoredFile,
+                     User)
+from .search import index_post, unindex_post
+from .thumbnails import enqueue_thumbnails
+from .timeline import backfill_timeline, drop_author, fan_out_post
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(author=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance, raw=False, **kwargs):
+    # При редактировании пост может уйти из ленты прежней группы
+    # или сменить картинку
+    instance._previous_feeds = []
+    instance._previous_image = None
+    if instance.pk is not None and not raw:
+        previous = Post.objects.filter(pk=instance.pk).only(
+            'author_id', 'group_id', 'image').first()
+        if previous is not None:
+            instance._previous_feeds = post_feeds(previous)
+            instance._previous_image = previous.image.name
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.change(instance.author_id, posts_count=1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def bump_saved_post_feeds(sender, instance, **kwargs):
+    bump_feeds(
+        post_feeds(instance) + getattr(instance, '_previous_feeds', [])
+    )
+
+
+@receiver(post_save, sender=Post)
+def enqueue_post_thumbnails(sender, instance, raw=False, **kwargs):
+    image = instance.image.name
+    if raw or image == instance._previous_image:
+        return
+    if instance._previous_image:
+        # Варианты прежней картинки больше не нужны: до новых пост
+        # покажет превью sorl-thumbnail. Их файлы освободит
+        # release_variant_file
+        PostImageVariant.objects.filter(post=instance).delete()
+    if image:
+        enqueue_thumbnails([(instance.pk, image)])
+
+
+@receiver(post_save, sender=Post)
+def count_post_image_references(sender, instance, raw=False, **kwargs):
+    image = instance.image.name
+    previous = getattr(instance, '_previous_image', None)
+    if not raw and image != previous:
+        with transaction.atomic():
+            StoredFile.change(image, 1)
+            StoredFile.change(previous, -1)
+
+
+@receiver(post_delete, sender=Post)
+def release_post_image(sender, instance, **kwargs):
+    StoredFile.change(instance.image.name, -1)
+
+
+@receiver(post_delete, sender=PostImageVariant)
+def release_variant_file(sender, instance, **kwargs):
+    # Варианты создаются через bulk_create, их ссылки считает
+    # generate_variants; удаляются же они и по одному, и каскадом
+    StoredFile.change(instance.file.name, -1)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    unindex_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    AuthorStats.change(instance.author_id, posts_count=-1)
+
+
+@receiver(post_delete, sender=Post)
+def bump_deleted_post_feeds(sender, instance, **kwargs):
+    bump_feeds(post_feeds(instance))
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.change(instance.author_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    AuthorStats.change(instance.author_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_post_feed(sender, instance, **kwargs):
+    bump_feeds([post_feed(instance.post_id)])
+
+
+@receiver(post_delete, sender=ArchivedPost)
+def delete_archived_post(sender, instance, **kwargs):
+    StoredFile.change(instance.image.name, -1)
+    AuthorStats.change(
+        instance.author_id, posts_count=-1, archived_posts_count=-1)
+    bump_feeds(post_feeds(instance))
+
+
+@receiver(post_delete, sender=ArchivedComment)
+def count_deleted_archived_comment(sender, instance, **kwargs):
+    AuthorStats.change(instance.author_id, comments_count=-1)
+    bump_feeds([post_feed(instance.post_id)])
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_groups_feed(sender, instance, **kwargs):
+    bump_feeds([GROUPS_FEED])
+
+
+def follow_feeds(follow):
+    # Счетчики подписок выводятся на страницах обоих пользователей
+    return [author_feed(follow.author_id), author_feed(follow.user_id)]
+
+
+@receiver(post_save, sender=Follow)
+def follow_author(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    AuthorStats.change(instance.author_id, followers_count=1)
+    AuthorStats.change(instance.user_id, following_count=1)
+    backfill_timeline(instance.user_id, instance.author_id)
+    bump_feeds(follow_feeds(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_author(sender, instance, **kwargs):
+    AuthorStats.change(instance.author_id, followers_count=-1)
+    AuthorStats.change(instance.user_id, following_count=-1)
+    drop_author(instance.user_id, instance.author_id)
+    bump_feeds(follow_feeds(instance))
@@ -0,0 +1,142 @@
+"""RSS, Atom и JSON Feed для лент index, group_posts и profile.
+
+Документ строится из проекции values().iterator() без моделей и
+хранится в кэше, пока не сменится поколение ленты (posts.cache),
+так что боты получают готовый ответ или 304.
+"""
+import hashlib
+import json
+from io import StringIO
+
+from django.http import HttpResponse
+from django.template.defaultfilters import linebreaksbr
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import (Atom1Feed, Rss201rev2Feed,
+                                        SyndicationFeed, rfc3339_date)
+from django.utils.http import http_date, quote_etag
+from django.utils.text import Truncator
+
+from .cache import feed_version, single_flight
+from .settings import ANONYMOUS_PAGE_TIMEOUT, SYNDICATION_ITEMS
+
+ITEM_FIELDS = (
+    'id',
+    'text',
+    'pub_date',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group__title',
+)
+
+
+class JSONFeed(SyndicationFeed):
+    """JSON Feed 1.1 (https://jsonfeed.org/version/1.1)."""
+
+    content_type = 'application/feed+json; charset=utf-8'
+
+    def write(self, outfile, encoding):
+        document = {
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': self.feed['title'],
+            'home_page_url': self.feed['link'],
+            'feed_url': self.feed['feed_url'],
+            'description': self.feed['description'],
+            'language': self.feed['language'],
+            'items': [
+                {
+                    'id': item['unique_id'],
+                    'url': item['link'],
+                    'title': item['title'],
+                    'content_html': item['description'],
+                    'date_published': rfc3339_date(item['pubdate']),
+                    'authors': [{'name': item['author_name']}],
+                    'tags': item['categories'],
+                }
+                for item in self.items
+            ],
+        }
+        json.dump(document, outfile, ensure_ascii=False)
+
+
+FORMATS = {
+    'rss': Rss201rev2Feed,
+    'atom': Atom1Feed,
+    'json': JSONFeed,
+}
+
+
+class FeedFormatConverter:
+    regex = '|'.join(FORMATS)
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+def item_title(text):
+    """Первая строка поста, обрезанная до 80 символов."""
+    lines = text.strip().splitlines()
+    return Truncator(lines[0]).chars(80) if lines else ''
+
+
+def build_document(request, feed_format, title, link, queryset):
+    """Документ ленты: (тело, Content-Type, время нового поста, ETag)."""
+    absolute = request.build_absolute_uri
+    generator = FORMATS[feed_format](
+        title=title,
+        link=absolute(link),
+        description=title,
+        language='ru',
+        feed_url=absolute(request.path)
+    )
+    newest = None
+    items = queryset.order_by('-pub_date', '-id').values(*ITEM_FIELDS)
+    for item in items[:SYNDICATION_ITEMS].iterator():
+        if newest is None:
+            newest = item['pub_date'].timestamp()
+        url = absolute(reverse(
+            'post', args=[item['author__username'], item['id']]))
+        author = ' '.join(filter(None, [
+            item['author__first_name'], item['author__last_name']
+        ])) or item['author__username']
+        generator.add_item(
+            title=item_title(item['text']) or url,
+            link=url,
+            description=linebreaksbr(item['text']),
+            unique_id=url,
+            pubdate=item['pub_date'],
+            author_name=author,
+            categories=[item['group__title']] if item['group__title'] else []
+        )
+    buffer = StringIO()
+    generator.write(buffer, 'utf-8')
+    body = buffer.getvalue().encode()
+    etag = quote_etag(hashlib.md5(body).hexdigest())
+    return body, generator.content_type, newest, etag
+
+
+def syndication_response(request, feed_format, feed, build):
+    """Ответ с документом из кэша; условные запросы получают 304."""
+    # Ссылки в документе абсолютные: и схема, и хост входят в ключ
+    body, content_type, newest, etag = single_flight(
+        f'syndication:{feed_format}:{feed}:'
+        f'{request.scheme}://{request.get_host()}',
+        build,
+        ANONYMOUS_PAGE_TIMEOUT,
+        version=feed_version(feed),
+        serve_stale=False
+    )
+    last_modified = int(newest) if newest is not None else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(body, content_type=content_type)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=0)
+    return response
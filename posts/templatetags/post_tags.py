@@ -0,0 +1,60 @@
+from django import template
+
+from posts.settings import IMAGE_VARIANT_FORMATS
+from posts.thumbnails import attach_thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    """Посты страницы с превью, найденными одним запросом."""
+    posts = list(posts)
+    attach_thumbnails(posts)
+    return posts
+
+
+@register.inclusion_tag('post_picture.html')
+def post_picture(post):
+    """<picture> из готовых вариантов картинки поста.
+
+    Варианты берутся из prefetch_related('image_variants'), поэтому
+    шаблону не нужно обращаться к файлам. Пока варианты не созданы,
+    sources пуст и шаблон выводит превью sorl-thumbnail: найденное
+    заранее тегом prefetch_thumbnails или, если его нет, тегом thumbnail.
+    """
+    by_format = {}
+    for variant in post.image_variants.all():
+        by_format.setdefault(variant.format, []).append(variant)
+    if not by_format:
+        return {'post': post, 'sources': []}
+    # Порядок строк из базы не задает порядок форматов: сортируем по
+    # IMAGE_VARIANT_FORMATS, последний — запасной для <img>
+    *preferred, fallback = [
+        sorted(by_format[name], key=lambda variant: variant.width)
+        for name in sorted(by_format, key=format_rank)
+    ]
+    return {
+        'post': post,
+        'sources': [
+            {
+                'type': variants[0].mime_type,
+                'srcset': srcset(variants),
+            }
+            for variants in preferred
+        ],
+        'fallback': fallback[-1],
+        'fallback_srcset': srcset(fallback),
+    }
+
+
+def format_rank(name):
+    # Неизвестный формат (сняли из настроек) запасным не бывает
+    if name not in IMAGE_VARIANT_FORMATS:
+        return -1
+    return IMAGE_VARIANT_FORMATS.index(name)
+
+
+def srcset(variants):
+    return ', '.join(
+        f'{variant.file.url} {variant.width}w' for variant in variants)
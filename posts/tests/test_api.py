@@ -0,0 +1,87 @@
+import json
+from unittest import mock, skipIf
+
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import api
+from posts.models import Comment, Group, Post, User
+
+POSTS = reverse('api:posts')
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {index}',
+                author=cls.author,
+                group=cls.group if index % 2 else None
+            )
+            for index in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.author, text='Комментарий')
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response.status_code, json.loads(response.content)
+
+    def test_cursor_pagination(self):
+        """Посты листаются курсорами, связанные объекты грузятся пачкой."""
+        with self.assertNumQueries(3):
+            status, first = self.get(POSTS, limit=3)
+        self.assertEqual(status, 200)
+        self.assertEqual(
+            [post['id'] for post in first['results']],
+            [post.id for post in self.posts[:1:-1]]
+        )
+        self.assertEqual(first['results'][0]['author']['name'], 'Лев Толстой')
+        self.assertEqual(first['results'][1]['group']['slug'], 'group')
+        self.assertIsNone(first['previous'])
+        status, second = self.get(first['next'])
+        self.assertEqual(
+            [post['id'] for post in second['results']],
+            [post.id for post in self.posts[1::-1]]
+        )
+        self.assertIsNone(second['next'])
+        self.assertEqual(self.get(POSTS, after='!')[0], 400)
+
+    @skipIf(api.orjson is None, 'orjson не установлен')
+    def test_json_without_orjson(self):
+        """Без orjson API отдает те же байты."""
+        response = self.client.get(POSTS)
+        with mock.patch('posts.api.orjson', None):
+            fallback = self.client.get(POSTS)
+        self.assertEqual(fallback.content, response.content)
+
+    def test_sparse_fieldsets(self):
+        """?fields= оставляет только запрошенные поля."""
+        with self.assertNumQueries(1):
+            status, data = self.get(POSTS, fields='id,text')
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        status, data = self.get(POSTS, fields='id,password')
+        self.assertEqual(status, 400)
+
+    def test_other_resources(self):
+        """Группы, профили и комментарии доступны через API."""
+        status, profile = self.get(
+            reverse('api:profile', args=['author']))
+        self.assertEqual(profile['posts_count'], 5)
+        status, posts = self.get(
+            reverse('api:group_posts', args=['group']))
+        self.assertEqual(len(posts['results']), 2)
+        status, comments = self.get(
+            reverse('api:post_comments', args=[self.posts[0].id]),
+            fields='text')
+        self.assertEqual(comments['results'], [{'text': 'Комментарий'}])
+        status, groups = self.get(reverse('api:groups'))
+        self.assertEqual(groups['results'][0]['slug'], 'group')
+        status, _ = self.get(reverse('api:post', args=[0]))
+        self.assertEqual(status, 404)
@@ -0,0 +1,118 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import (ArchivedComment, ArchivedPost, AuthorStats,
+                          Comment, Post, User)
+from posts.search import search_posts
+from posts.settings import PAGE_SIZE
+
+
+class ArchiveTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.old_post = self.create_post('Старый пост', days=400)
+        Comment.objects.create(
+            post=self.old_post, author=self.reader, text='Старый отзыв')
+        self.new_post = self.create_post('Новый пост', days=1)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def create_post(self, text, days):
+        post = Post.objects.create(text=text, author=self.author)
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=timezone.now() - timedelta(days=days))
+        return post
+
+    def archive(self, *args):
+        call_command('archive_posts', *args, stdout=StringIO())
+
+    def post_url(self, post):
+        return reverse('post', args=[self.author.username, post.id])
+
+    def test_moves_old_posts_with_comments(self):
+        """Старые посты и их комментарии переезжают в архив с теми же id."""
+        self.archive('--days', '365', '--batch-size', '1')
+        self.assertEqual(list(Post.objects.all()), [self.new_post])
+        archived = ArchivedPost.objects.get()
+        self.assertEqual(archived.id, self.old_post.id)
+        self.assertEqual(archived.text, 'Старый пост')
+        self.assertEqual(ArchivedComment.objects.get().post, archived)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(search_posts('старый', PAGE_SIZE).object_list, [])
+        stats = AuthorStats.objects.get(author=self.author)
+        self.assertEqual(stats.posts_count, 2)
+        self.assertEqual(stats.archived_posts_count, 1)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.reader).comments_count, 1)
+
+    def test_post_view_falls_through_to_archive(self):
+        """Страница поста из архива открывается, но без формы комментария."""
+        self.archive()
+        response = self.reader_client.get(self.post_url(self.old_post))
+        self.assertContains(response, 'Старый пост')
+        self.assertContains(response, 'Старый отзыв')
+        self.assertNotContains(
+            response,
+            reverse('add_comment', args=['author', self.old_post.id])
+        )
+        self.assertEqual(
+            self.reader_client.get(
+                reverse('post', args=['reader', self.old_post.id])
+            ).status_code,
+            404
+        )
+
+    def test_archived_card_is_rendered_again(self):
+        """Карточка архивного поста не берется из кэша горячего."""
+        author_client = Client()
+        author_client.force_login(self.author)
+        edit_url = reverse('post_edit', args=['author', self.old_post.id])
+        self.assertContains(
+            author_client.get(self.post_url(self.old_post)), edit_url)
+        self.archive()
+        response = author_client.get(self.post_url(self.old_post))
+        self.assertContains(response, 'Старый пост')
+        self.assertNotContains(response, edit_url)
+
+    def test_profile_continues_into_archive(self):
+        """Профиль показывает архивные посты после горячих."""
+        hot = [self.new_post] + [
+            self.create_post(f'Пост {day}', days=day)
+            for day in range(2, PAGE_SIZE + 1)
+        ]
+        self.archive()
+        self.assertEqual(ArchivedPost.objects.count(), 1)
+        page = self.client.get(
+            reverse('profile', args=['author'])).context['page']
+        self.assertEqual(page.paginator.count, PAGE_SIZE + 1)
+        self.assertEqual([post.id for post in page], [p.id for p in hot])
+        page = self.client.get(
+            reverse('profile', args=['author']), {'page': 2}
+        ).context['page']
+        self.assertEqual([post.id for post in page], [self.old_post.id])
+
+    def test_profile_page_mixes_hot_and_archived_posts(self):
+        self.archive()
+        page = self.client.get(
+            reverse('profile', args=['author'])).context['page']
+        self.assertEqual(
+            [post.id for post in page],
+            [self.new_post.id, self.old_post.id]
+        )
+
+    def test_deleting_archived_post_updates_stats(self):
+        self.archive()
+        ArchivedPost.objects.get().delete()
+        stats = AuthorStats.objects.get(author=self.author)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.archived_posts_count, 0)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.reader).comments_count, 0)
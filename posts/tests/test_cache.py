@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from posts.cache import single_flight
+from posts.decorators import anonymous_cache
+from yatube.cache import SQLiteCache
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertTrue(self.cache.add('other', 2))
+        self.assertEqual(
+            self.cache.get_many(['key', 'other', 'missing']),
+            {'key': {'value': 1}, 'other': 2}
+        )
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expired_value(self):
+        self.cache.set('key', 1, -1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 2))
+
+    def test_shared_between_instances(self):
+        """Запись одного процесса видна другому, открывшему тот же файл."""
+        other = SQLiteCache(self.location, {})
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+
+class SingleFlightTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_serves_stale_value_while_locked(self):
+        """Пока значение пересчитывается, остальные получают прежнее."""
+        self.assertEqual(single_flight('key', lambda: 1, 60, version=1), 1)
+        cache.add('key:lock', True)
+        self.assertEqual(single_flight('key', lambda: 2, 60, version=2), 1)
+        cache.delete('key:lock')
+        self.assertEqual(single_flight('key', lambda: 2, 60, version=2), 2)
+        self.assertEqual(single_flight('key', lambda: 3, 60, version=2), 2)
+
+
+class AnonymousCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def get(self, status):
+        def view(request):
+            self.calls += 1
+            return HttpResponse('page', status=status)
+
+        request = RequestFactory().get('/page/')
+        request.user = AnonymousUser()
+        return anonymous_cache(lambda: ['page'])(view)(request)
+
+    def test_caches_only_successful_pages(self):
+        self.assertEqual(self.get(503).status_code, 503)
+        self.assertEqual(self.get(200).status_code, 200)
+        self.assertEqual(self.get(200).status_code, 200)
+        self.assertEqual(self.calls, 2)
+
+    def test_tests_use_temporary_cache_file(self):
+        """Тесты не трогают общий файл кэша разработчика."""
+        self.assertFalse(
+            settings.CACHES['default']['LOCATION'].startswith(
+                os.path.join(settings.BASE_DIR, 'cache'))
+        )
@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import TestCase, override_settings
+
+PRAGMAS = {
+    'busy_timeout': 3000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -2048,
+}
+
+
+class SQLitePragmasTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.wrapper = DatabaseWrapper(
+            dict(
+                connection.settings_dict,
+                NAME=os.path.join(self.directory, 'db.sqlite3')
+            ),
+            alias='pragmas'
+        )
+
+    def tearDown(self):
+        self.wrapper.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def pragma(self, name):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS=PRAGMAS)
+    def test_pragmas_applied_to_new_connection(self):
+        """Новое соединение получает PRAGMA из настроек."""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('busy_timeout'), 3000)
+        # synchronous=NORMAL
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('cache_size'), -2048)
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_default_profile_keeps_sqlite_defaults(self):
+        self.assertEqual(self.pragma('journal_mode'), 'delete')
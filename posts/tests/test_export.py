@@ -0,0 +1,90 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.posts = [
+            Post.objects.create(text=f'Пост {index}', author=self.author)
+            for index in range(5)
+        ]
+        Comment.objects.create(
+            post=self.posts[0], author=self.author, text='Комментарий')
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @mock.patch('posts.export.EXPORT_CHUNK_SIZE', 2)
+    def test_command_exports_all_rows(self):
+        """Команда выгружает все строки порциями в gzip."""
+        call_command(
+            'export_content', 'posts', 'comments',
+            output_dir=self.directory, stdout=StringIO())
+        with gzip.open(
+                os.path.join(self.directory, 'posts.jsonl.gz'), 'rt') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(
+            [row['id'] for row in rows], [post.id for post in self.posts])
+        self.assertEqual(rows[0]['type'], 'post')
+        self.assertEqual(rows[0]['author'], 'author')
+        with gzip.open(
+                os.path.join(self.directory, 'comments.jsonl.gz'), 'rt') as f:
+            self.assertEqual(json.loads(f.readline())['post'],
+                             self.posts[0].id)
+
+    def test_export_imports_back_with_comments(self):
+        """Посты и комментарии из выгрузки импортируются обратно."""
+        call_command(
+            'export_content', 'posts', 'comments',
+            output_dir=self.directory, stdout=StringIO())
+        Post.objects.all().delete()
+        id_map = os.path.join(self.directory, 'ids.tsv')
+        for kind in ('posts', 'comments'):
+            call_command(
+                'import_posts',
+                os.path.join(self.directory, f'{kind}.jsonl.gz'),
+                id_map=id_map, stdout=StringIO(), stderr=StringIO()
+            )
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            [post.text for post in self.posts]
+        )
+        comment = Comment.objects.get()
+        self.assertEqual(comment.text, 'Комментарий')
+        self.assertEqual(comment.post.text, 'Пост 0')
+        self.assertEqual(comment.post.pub_date, self.posts[0].pub_date)
+
+    def test_endpoint_is_admin_only(self):
+        """Выгрузка по HTTP доступна только персоналу и идет потоком."""
+        url = reverse('export', args=['users'])
+        client = Client()
+        client.force_login(self.author)
+        self.assertEqual(client.get(url).status_code, 302)
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client.force_login(admin)
+        response = client.get(url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(StringIO(gzip.decompress(
+            b''.join(response.streaming_content)).decode())))
+        self.assertEqual(
+            [row['username'] for row in rows], ['author', 'admin'])
+        self.assertNotIn('password', rows[0])
+        self.assertEqual(
+            client.get(reverse('export', args=['sessions'])).status_code,
+            404
+        )
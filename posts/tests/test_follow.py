@@ -0,0 +1,115 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats, Follow, Post, TimelineEntry, User
+
+FOLLOW_INDEX = reverse('follow_index')
+
+
+class FollowTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.stranger = User.objects.create_user(username='stranger')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.stranger_client = Client()
+        self.stranger_client.force_login(self.stranger)
+
+    def follow(self, client, author):
+        return client.get(reverse('profile_follow', args=[author.username]))
+
+    def feed(self, client, **params):
+        return client.get(FOLLOW_INDEX, params).context['page']
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка меняют счетчики обоих пользователей."""
+        self.follow(self.reader_client, self.author)
+        self.follow(self.reader_client, self.author)
+        self.follow(self.reader_client, self.reader)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.author).followers_count, 1)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.reader).following_count, 1)
+        self.reader_client.get(
+            reverse('profile_unfollow', args=[self.author.username]))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.author).followers_count, 0)
+
+    def test_new_post_reaches_followers_only(self):
+        """Новый пост появляется только в лентах подписчиков."""
+        old = Post.objects.create(text='Старый пост', author=self.author)
+        self.follow(self.reader_client, self.author)
+        new = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(list(self.feed(self.reader_client)), [new, old])
+        self.assertEqual(list(self.feed(self.stranger_client)), [])
+        self.reader_client.get(
+            reverse('profile_unfollow', args=[self.author.username]))
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    @mock.patch('posts.timeline.TIMELINE_TRIM_SLACK', 1)
+    @mock.patch('posts.timeline.TIMELINE_LENGTH', 2)
+    def test_timeline_is_bounded(self):
+        """Переросшая лента обрезается до TIMELINE_LENGTH постов."""
+        self.follow(self.reader_client, self.author)
+        entries = TimelineEntry.objects.filter(follower=self.reader)
+        for index in range(3):
+            Post.objects.create(text=f'Пост {index}', author=self.author)
+        self.assertEqual(entries.count(), 3)
+        Post.objects.create(text='Пост 3', author=self.author)
+        self.assertEqual(
+            set(entries.values_list('post__text', flat=True)),
+            {'Пост 3', 'Пост 2'}
+        )
+
+    @mock.patch('posts.timeline.FANOUT_MAX_FOLLOWERS', 2)
+    def test_popular_author_is_read_on_demand(self):
+        """Посты популярного автора подмешиваются в ленту при чтении."""
+        regular = User.objects.create_user(username='regular')
+        self.follow(self.reader_client, self.author)
+        self.follow(self.stranger_client, self.author)
+        self.follow(self.reader_client, regular)
+        posts = [
+            Post.objects.create(text=f'Пост {index}', author=author)
+            for index, author in enumerate(
+                [self.author, regular, self.author, regular])
+        ]
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__author=self.author).exists())
+        self.assertTrue(
+            TimelineEntry.objects.filter(post__author=regular).exists())
+        with mock.patch('posts.views.PAGE_SIZE', 3):
+            first = self.feed(self.reader_client)
+            second = self.feed(self.reader_client, after=first.next_cursor)
+        self.assertEqual(list(first), posts[:0:-1])
+        self.assertEqual(list(second), posts[:1])
+
+    @mock.patch('posts.timeline.FANOUT_MAX_FOLLOWERS', 3)
+    def test_posts_stay_after_author_drops_below_threshold(self):
+        """Посты, не разложенные по лентам, не пропадают, когда
+        подписчиков у автора становится меньше порога."""
+        clients = {}
+        for username in ('extra', 'latecomer'):
+            clients[username] = Client()
+            clients[username].force_login(
+                User.objects.create_user(username=username))
+        old = Post.objects.create(text='До порога', author=self.author)
+        for client in (self.reader_client, self.stranger_client,
+                       clients['extra']):
+            self.follow(client, self.author)
+        popular = Post.objects.create(text='За порогом', author=self.author)
+        self.follow(clients['latecomer'], self.author)
+        for client in (self.stranger_client, clients['extra']):
+            client.get(
+                reverse('profile_unfollow', args=[self.author.username]))
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.author).followers_count, 2)
+        for client in (self.reader_client, clients['latecomer']):
+            with self.subTest(client=client):
+                self.assertEqual(list(self.feed(client)), [popular, old])
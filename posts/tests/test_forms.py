@@ -1,5 +1,7 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
 
 from django import forms
 
@@ -7,8 +9,10 @@ from django.conf import settings
 from django.test import Client, TestCase
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
+from PIL import Image
 
 from posts.models import Group, Post, User
+from posts.settings import IMAGE_MAX_SIDE
 
 INDEX = reverse('index')
 NEW_POST = reverse('new_post')
@@ -85,9 +89,64 @@ class PostFormTests(TestCase):
         self.assertEqual(new_post.text, POST_TEXT)
         self.assertEqual(new_post.group, self.group)
         self.assertEqual(new_post.author, self.user)
-        self.assertEqual(new_post.image, f'posts/{uploaded_file.name}')
+        digest = hashlib.sha256(small_gif).hexdigest()
+        self.assertEqual(new_post.image, f'posts/{digest[:2]}/{digest}.gif')
         self.assertRedirects(response, INDEX)
 
+    def upload(self, image, name, image_format, **params):
+        buffer = BytesIO()
+        image.save(buffer, image_format, **params)
+        return self.authorized_client.post(NEW_POST, data={
+            'text': POST_TEXT,
+            'image': SimpleUploadedFile(name, buffer.getvalue()),
+        })
+
+    def test_large_image_is_downscaled_without_exif(self):
+        """Большой оригинал уменьшается, EXIF из него удаляется."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        self.upload(
+            Image.new('RGB', (IMAGE_MAX_SIDE * 2, 100)),
+            'large.jpg', 'JPEG', exif=exif.tobytes()
+        )
+        post = Post.objects.exclude(image='').get()
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (IMAGE_MAX_SIDE, 50))
+            self.assertFalse(stored.getexif())
+
+    def test_decompression_bomb_is_rejected(self):
+        """Картинка с огромным числом точек отклоняется до декодирования."""
+        posts_count = Post.objects.count()
+        response = self.upload(
+            Image.new('1', (10000, 10000)), 'bomb.png', 'PNG')
+        self.assertEqual(Post.objects.count(), posts_count)
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка слишком большая: 10000×10000 точек.'
+        )
+
+    def test_truncated_image_is_rejected(self):
+        """Обрезанные JPEG и GIF не проходят форму."""
+        posts_count = Post.objects.count()
+        for image_format, mode in (('JPEG', 'RGB'), ('GIF', 'L')):
+            with self.subTest(image_format=image_format):
+                buffer = BytesIO()
+                Image.effect_noise((64, 64), 50).convert(mode).save(
+                    buffer, image_format)
+                data = buffer.getvalue()
+                response = self.authorized_client.post(NEW_POST, data={
+                    'text': POST_TEXT,
+                    'image': SimpleUploadedFile(
+                        f'broken.{image_format.lower()}',
+                        data[:len(data) // 2]
+                    ),
+                })
+                self.assertFormError(
+                    response, 'form', 'image',
+                    forms.ImageField.default_error_messages['invalid_image']
+                )
+        self.assertEqual(Post.objects.count(), posts_count)
+
     def test_post_edit(self):
         """При редактировании поста изменяется запись в базе данных."""
         text_after_edit = 'Тестовый пост после редактирования'
@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import (AuthorStats, Comment, Follow, Group, Post,
+                          TimelineEntry, User)
+from posts.search import search_posts
+
+RECORDS = [
+    {'type': 'post', 'id': 'a1', 'text': 'Первый старый пост',
+     'pub_date': '2015-01-01T10:00:00', 'author': 'leo', 'group': 'old'},
+    {'type': 'post', 'id': 'a2', 'text': 'Второй старый пост',
+     'pub_date': '2015-01-02T10:00:00', 'author': 'leo'},
+    {'type': 'comment', 'post': 'a1', 'text': 'Комментарий',
+     'created': '2015-01-03T10:00:00', 'author': 'fedor'},
+    {'type': 'post', 'id': 'a3', 'text': 'Пост без автора',
+     'pub_date': '2015-01-04T10:00:00', 'author': 'nobody'},
+]
+
+
+class ImportPostsTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'posts.jsonl')
+        with open(self.path, 'w') as source:
+            for record in RECORDS:
+                source.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.leo = User.objects.create_user(username='leo')
+        self.fedor = User.objects.create_user(username='fedor')
+        Group.objects.create(title='Старое', slug='old', description='-')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def import_posts(self, *args):
+        call_command(
+            'import_posts', self.path, *args,
+            stdout=StringIO(), stderr=StringIO())
+
+    def test_import_and_rebuild(self):
+        """Посты и комментарии импортируются с исходными датами."""
+        self.import_posts('--batch-size', '2')
+        post = Post.objects.get(text='Первый старый пост')
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.group.slug, 'old')
+        self.assertEqual(Comment.objects.get().post, post)
+        self.assertFalse(Post.objects.filter(text='Пост без автора'))
+        self.assertEqual(
+            AuthorStats.objects.get(author__username='leo').posts_count, 2)
+        self.assertEqual(len(search_posts('старый', 10)), 2)
+
+    def test_resume_does_not_duplicate(self):
+        """Повторный запуск продолжает с контрольной точки."""
+        self.import_posts('--batch-size', '2')
+        with open(self.path, 'a') as source:
+            source.write(json.dumps({
+                'type': 'comment', 'post': 'a2', 'text': 'Еще',
+                'created': '2015-01-05T10:00:00', 'author': 'leo'
+            }) + '\n')
+        self.import_posts('--create-authors')
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(
+            Comment.objects.get(text='Еще').post.text, 'Второй старый пост')
+
+    def test_csv_with_new_authors(self):
+        """CSV читается, неизвестные авторы создаются по флагу."""
+        self.path = os.path.join(self.directory, 'posts.csv')
+        with open(self.path, 'w') as source:
+            source.write('type,id,text,pub_date,author,group\n'
+                         'post,1,Из CSV,2016-05-01 12:00,anna,\n')
+        self.import_posts('--create-authors')
+        self.assertEqual(
+            Post.objects.get(text='Из CSV').author.username, 'anna')
+
+    def write_checkpoint(self, next_post_id, next_comment_id):
+        with open(f'{self.path}.checkpoint', 'w') as checkpoint:
+            json.dump({
+                'source': os.path.abspath(self.path),
+                'position': 0,
+                'next_post_id': next_post_id,
+                'next_comment_id': next_comment_id,
+            }, checkpoint)
+
+    def test_taken_ids_are_not_overwritten(self):
+        """id, занятые постом с сайта, пачка не затирает."""
+        live = Post.objects.create(text='Пост с сайта', author=self.fedor)
+        self.write_checkpoint(live.id, 1)
+        self.import_posts()
+        self.assertEqual(Post.objects.get(id=live.id).text, 'Пост с сайта')
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(
+            Comment.objects.get().post.text, 'Первый старый пост')
+
+    def test_replayed_batch_is_not_duplicated(self):
+        """Пачка, вставленная до падения, при повторе не задваивается."""
+        self.import_posts()
+        first_post = Post.objects.order_by('id').first()
+        self.write_checkpoint(first_post.id, Comment.objects.get().id)
+        os.remove(f'{self.path}.checkpoint.posts')
+        self.import_posts()
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_imported_posts_reach_followers(self):
+        """Импортированные посты попадают в ленты подписчиков."""
+        Follow.objects.create(user=self.fedor, author=self.leo)
+        self.import_posts()
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(follower=self.fedor)
+                .values_list('post__text', flat=True)),
+            {'Первый старый пост', 'Второй старый пост'}
+        )
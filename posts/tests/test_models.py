@@ -1,6 +1,9 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from posts.models import Group, Post, User
+from posts.models import AuthorStats, Comment, Group, Post, User
 
 
 class PostModelTest(TestCase):
@@ -69,3 +72,42 @@ class GroupModelTest(TestCase):
         group = GroupModelTest.group
         expected_object_name = group.title
         self.assertEquals(expected_object_name, str(group))
+
+
+class AuthorStatsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+
+    def get_stats(self, user):
+        return AuthorStats.objects.get(author=user)
+
+    def test_counters_follow_writes(self):
+        """Создание и удаление постов и комментариев меняют счетчики."""
+        post = Post.objects.create(text='Пост', author=self.user)
+        Post.objects.create(text='Еще пост', author=self.user)
+        Comment.objects.create(text='Комментарий', post=post,
+                               author=self.reader)
+        self.assertEqual(self.get_stats(self.user).posts_count, 2)
+        self.assertEqual(self.get_stats(self.reader).comments_count, 1)
+        post.delete()
+        self.assertEqual(self.get_stats(self.user).posts_count, 1)
+        self.assertEqual(self.get_stats(self.reader).comments_count, 0)
+
+    def test_rebuild_command(self):
+        """Команда rebuild_author_stats восстанавливает счетчики."""
+        post = Post.objects.create(text='Пост', author=self.user)
+        Comment.objects.create(text='Комментарий', post=post,
+                               author=self.reader)
+        AuthorStats.objects.all().update(posts_count=42, comments_count=42)
+        AuthorStats.objects.filter(author=self.reader).delete()
+        call_command('rebuild_author_stats', stdout=StringIO())
+        self.assertEqual(self.get_stats(self.user).posts_count, 1)
+        self.assertEqual(self.get_stats(self.user).comments_count, 0)
+        self.assertEqual(self.get_stats(self.reader).comments_count, 1)
+
+    def test_missing_stats_are_recounted(self):
+        Post.objects.create(text='Пост', author=self.user)
+        AuthorStats.objects.filter(author=self.user).delete()
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(AuthorStats.get_for(user).posts_count, 1)
@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.search import search_posts
+
+SEARCH = reverse('search')
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.strong = Post.objects.create(
+            text='Котики, котики и еще раз котики', author=self.user)
+        self.weak = Post.objects.create(
+            text='Длинный пост о собаках, где котики упомянуты однажды, '
+                 'а все остальное время речь идет о прогулках',
+            author=self.user
+        )
+        self.other = Post.objects.create(
+            text='Пост <b>о</b> погоде', author=self.user)
+
+    def test_results_are_ranked(self):
+        """Посты, где слово встречается чаще, стоят выше."""
+        page = search_posts('котик', 10)
+        self.assertEqual(list(page), [self.strong, self.weak])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        self.other.text = 'Теперь и тут котики'
+        self.other.save()
+        self.assertIn(self.other, list(search_posts('котики', 10)))
+        self.strong.delete()
+        self.assertNotIn(self.strong, list(search_posts('котики', 10)))
+        self.assertFalse(search_posts('погоде', 10))
+
+    def test_cursor_pagination(self):
+        """Курсоры ведут по выдаче вперед и назад."""
+        first = search_posts('котики', 1)
+        self.assertEqual(list(first), [self.strong])
+        self.assertFalse(first.has_previous())
+        second = search_posts('котики', 1, after=first.next_cursor)
+        self.assertEqual(list(second), [self.weak])
+        self.assertFalse(second.has_next())
+        back = search_posts('котики', 1, before=second.previous_cursor)
+        self.assertEqual(list(back), [self.strong])
+
+    def test_view_highlights_escaped_snippet(self):
+        """Найденные слова подсвечиваются, HTML из текста экранируется."""
+        response = Client().get(SEARCH, {'q': '"погод'})
+        self.assertContains(response, '<mark>погоде</mark>')
+        self.assertContains(response, '&lt;b&gt;о&lt;/b&gt;')
+        self.assertEqual(
+            Client().get(SEARCH, {'q': 'котики', 'after': '!'}).status_code,
+            404
+        )
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через индекс."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котики'})
+        self.assertEqual(
+            set(response.context['cl'].result_list), {self.strong, self.weak})
+
+    def test_rebuild_index(self):
+        """rebuild_search_index восстанавливает потерянный индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_post_search')
+        self.assertFalse(search_posts('котики', 10))
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(search_posts('котики', 10)), 2)
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from yatube.staticfiles import compressors
+
+STYLE = 'body { color: black; }\n' * 100
+
+
+class CompressedStaticFilesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        source = os.path.join(cls.directory, 'source')
+        os.makedirs(source)
+        with open(os.path.join(source, 'app.css'), 'w') as style:
+            style.write(STYLE)
+        cls.settings = override_settings(
+            STATIC_ROOT=os.path.join(cls.directory, 'static'),
+            STATICFILES_DIRS=[source]
+        )
+        cls.settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_collectstatic_writes_hashed_compressed_copies(self):
+        """collectstatic создает файл с хэшем и его сжатую копию."""
+        name = staticfiles_storage.stored_name('app.css')
+        self.assertNotEqual(name, 'app.css')
+        self.assertTrue(staticfiles_storage.exists(name + '.gz'))
+
+    def test_hashed_file_is_served_compressed_and_immutable(self):
+        """Файл с хэшем отдается сжатым и кэшируется навсегда."""
+        url = staticfiles_storage.url('app.css')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content).decode(), STYLE)
+
+    def test_unhashed_file_is_not_immutable(self):
+        """Файл без хэша в имени кэшируется ненадолго."""
+        response = self.client.get(f'{settings.STATIC_URL}app.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response.close()
+
+
+class CompressorsTest(SimpleTestCase):
+    def test_gzip_without_brotli(self):
+        """Без пакета brotli остается только gzip."""
+        with mock.patch('yatube.staticfiles.brotli', None):
+            self.assertEqual(
+                [encoding for encoding, _, _ in compressors()], ['gzip'])
+
+    def test_brotli_is_preferred(self):
+        """С пакетом brotli копия .br идет первой."""
+        brotli = mock.Mock()
+        brotli.compress.return_value = b'compressed'
+        with mock.patch('yatube.staticfiles.brotli', brotli):
+            found = list(compressors())
+            self.assertEqual(
+                [(encoding, extension) for encoding, extension, _ in found],
+                [('br', '.br'), ('gzip', '.gz')]
+            )
+            self.assertEqual(found[0][2](STYLE.encode()), b'compressed')
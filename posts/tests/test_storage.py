@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts.models import Post, StoredFile, User
+from posts.storage import content_storage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+
+    def create_post(self, name):
+        return Post.objects.create(
+            text='Пост',
+            author=self.user,
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif')
+        )
+
+    def collect_media(self):
+        call_command('collect_media', grace=-1, stdout=StringIO())
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковые картинки разных постов хранятся одним файлом."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            StoredFile.objects.get(name=first.image.name).references, 2)
+
+    def test_concurrent_uploads_share_hash_name(self):
+        """Загрузка, опоздавшая к проверке exists(), получает то же имя."""
+        with mock.patch.object(content_storage, 'exists', return_value=False):
+            names = [
+                content_storage.save('posts/race.gif', ContentFile(SMALL_GIF))
+                for _ in range(2)
+            ]
+        self.assertEqual(names[0], names[1])
+        directory = os.path.dirname(content_storage.path(names[0]))
+        self.assertEqual(os.listdir(directory), [os.path.basename(names[0])])
+        with content_storage.open(names[0]) as stored:
+            self.assertEqual(stored.read(), SMALL_GIF)
+
+    def test_collect_media_deletes_only_orphans(self):
+        """Файл удаляется, только когда на него не осталось ссылок."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        name = first.image.name
+        first.delete()
+        self.collect_media()
+        self.assertTrue(content_storage.exists(name))
+        second.image = None
+        second.save()
+        self.collect_media()
+        self.assertFalse(content_storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_rebuild_restores_references(self):
+        """--rebuild пересчитывает ссылки по постам."""
+        post = self.create_post('first.gif')
+        StoredFile.objects.all().delete()
+        call_command('collect_media', rebuild=True, stdout=StringIO())
+        self.assertEqual(
+            StoredFile.objects.get(name=post.image.name).references, 1)
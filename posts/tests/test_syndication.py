@@ -0,0 +1,72 @@
+import json
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+INDEX_RSS = reverse('index_syndication', args=['rss'])
+
+
+class SyndicationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        self.post = Post.objects.create(
+            text='Заголовок поста\nи <b>текст</b>',
+            author=self.author,
+            group=self.group
+        )
+
+    def test_formats(self):
+        """Ленты отдаются в RSS, Atom и JSON Feed."""
+        rss = ElementTree.fromstring(self.client.get(INDEX_RSS).content)
+        self.assertEqual(
+            rss.find('channel/item/title').text, 'Заголовок поста')
+        atom = self.client.get(
+            reverse('group_syndication', args=[self.group.slug, 'atom']))
+        self.assertEqual(atom['Content-Type'], 'application/atom+xml; '
+                                               'charset=utf-8')
+        document = json.loads(self.client.get(
+            reverse('profile_syndication', args=['author', 'json'])
+        ).content)
+        item = document['items'][0]
+        self.assertEqual(item['tags'], ['Группа'])
+        self.assertIn('&lt;b&gt;текст&lt;/b&gt;', item['content_html'])
+        self.assertEqual(
+            self.client.get('/feeds/index.xml').status_code, 404)
+
+    def test_conditional_get_and_cache(self):
+        """Лента кэшируется до новой записи и поддерживает 304."""
+        response = self.client.get(INDEX_RSS)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.client.get(
+                    INDEX_RSS, HTTP_IF_NONE_MATCH=response['ETag']
+                ).status_code,
+                304
+            )
+            self.assertEqual(
+                self.client.get(
+                    INDEX_RSS,
+                    HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                ).status_code,
+                304
+            )
+        Post.objects.create(text='Свежий пост', author=self.author)
+        response = self.client.get(
+            INDEX_RSS, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Свежий пост')
+
+    def test_cache_is_separate_per_scheme(self):
+        """Документ, собранный по http, не отдается по https."""
+        self.client.get(INDEX_RSS)
+        rss = ElementTree.fromstring(
+            self.client.get(INDEX_RSS, secure=True).content)
+        self.assertTrue(
+            rss.find('channel/item/link').text.startswith('https://'))
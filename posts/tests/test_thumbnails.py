@@ -0,0 +1,201 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post, PostImageVariant, ThumbnailJob, User
+from posts.templatetags.post_tags import post_picture
+from posts.thumbnails import (attach_thumbnails, generate_thumbnails,
+                              process_thumbnail_jobs, variant_formats)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailQueueTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+
+    def create_post(self, **kwargs):
+        return Post.objects.create(text='Пост', author=self.user, **kwargs)
+
+    def test_saving_image_enqueues_thumbnails(self):
+        """Пост с новой картинкой ставится в очередь на превью."""
+        post = self.create_post(image=SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif'))
+        self.create_post()
+        self.assertEqual(
+            list(ThumbnailJob.objects.values_list('post', flat=True)),
+            [post.id]
+        )
+        ThumbnailJob.objects.all().delete()
+        post.text = 'Правка без новой картинки'
+        post.save()
+        self.assertFalse(ThumbnailJob.objects.exists())
+
+    def test_worker_generates_thumbnails(self):
+        """Воркер создает превью и убирает задачу из очереди."""
+        self.create_post(image=SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif'))
+        call_command('thumbnail_worker', once=True, stdout=StringIO())
+        self.assertFalse(ThumbnailJob.objects.exists())
+        self.assertTrue(os.path.isdir(os.path.join(TEMP_MEDIA_ROOT, 'cache')))
+
+    def test_worker_generates_image_variants(self):
+        """Воркер создает варианты картинки, лента выводит их в srcset."""
+        buffer = BytesIO()
+        Image.new('RGB', (700, 300), 'red').save(buffer, 'PNG')
+        post = self.create_post(image=SimpleUploadedFile(
+            'big.png', buffer.getvalue(), content_type='image/png'))
+        call_command('thumbnail_worker', once=True, stdout=StringIO())
+        variants = PostImageVariant.objects.filter(post=post)
+        self.assertEqual(
+            sorted(set(variants.values_list('width', flat=True))),
+            [320, 640]
+        )
+        self.assertEqual(
+            set(variants.values_list('format', flat=True)),
+            set(variant_formats())
+        )
+        cache.clear()
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'srcset=')
+        for variant in variants:
+            self.assertContains(
+                response, f'{variant.file.url} {variant.width}w')
+
+    def png(self, name, color):
+        buffer = BytesIO()
+        Image.new('RGB', (400, 300), color).save(buffer, 'PNG')
+        return SimpleUploadedFile(
+            name, buffer.getvalue(), content_type='image/png')
+
+    def test_new_image_drops_old_variants(self):
+        """После замены картинки старые варианты не показываются."""
+        post = self.create_post(image=self.png('red.png', 'red'))
+        process_thumbnail_jobs(1)
+        old_files = set(post.image_variants.values_list('file', flat=True))
+        self.assertTrue(old_files)
+        post.image = self.png('blue.png', 'blue')
+        post.save()
+        self.assertFalse(post.image_variants.exists())
+        self.assertEqual(ThumbnailJob.objects.get().source, post.image.name)
+        cache.clear()
+        response = self.client.get(
+            reverse('post', args=[self.user.username, post.id]))
+        for name in old_files:
+            self.assertNotContains(response, name)
+
+    def test_edit_during_job_rearms_it(self):
+        """Правка во время работы воркера не теряется."""
+        post = self.create_post(image=self.png('red.png', 'red'))
+        ThumbnailJob.objects.update(attempts=1)
+
+        def edit(image):
+            edited = Post.objects.get(pk=post.pk)
+            edited.image = self.png('blue.png', 'blue')
+            edited.save()
+
+        with mock.patch('posts.thumbnails.generate_thumbnails', edit):
+            process_thumbnail_jobs(1)
+        post.refresh_from_db()
+        job = ThumbnailJob.objects.get()
+        self.assertEqual(job.source, post.image.name)
+        self.assertEqual(job.attempts, 0)
+        self.assertFalse(post.image_variants.exists())
+        process_thumbnail_jobs(1)
+        self.assertFalse(ThumbnailJob.objects.exists())
+        variant = post.image_variants.first()
+        with variant.file.open('rb') as image_file:
+            red, _, blue = Image.open(image_file).convert('RGB').getpixel(
+                (0, 0))
+        self.assertGreater(blue, red)
+
+    def test_variant_formats_follow_installed_codecs(self):
+        """AVIF берется, только если Pillow умеет его сохранять."""
+        Image.init()
+        codecs = {
+            name: save for name, save in Image.SAVE.items() if name != 'AVIF'}
+        with mock.patch.dict(Image.SAVE, codecs, clear=True):
+            self.assertEqual(variant_formats(), ['WEBP', 'JPEG'])
+        with mock.patch.dict(Image.SAVE, {'AVIF': mock.Mock()}):
+            self.assertEqual(variant_formats(), ['AVIF', 'WEBP', 'JPEG'])
+
+    def test_fallback_is_last_configured_format(self):
+        """Запасной <img> — JPEG, в каком бы порядке ни шли строки."""
+        post = self.create_post(image=self.png('red.png', 'red'))
+        PostImageVariant.objects.bulk_create(
+            PostImageVariant(
+                post=post, format=image_format, width=width, height=100,
+                file=f'posts/variants/{width}.{image_format.lower()}'
+            )
+            for width in (640, 320)
+            for image_format in ('JPEG', 'WEBP', 'AVIF')
+        )
+        picture = post_picture(Post.objects.feed().get(pk=post.pk))
+        self.assertEqual(picture['fallback'].format, 'JPEG')
+        self.assertEqual(picture['fallback'].width, 640)
+        self.assertEqual(
+            [source['type'] for source in picture['sources']],
+            ['image/avif', 'image/webp']
+        )
+        self.assertTrue(
+            picture['fallback_srcset'].startswith('/media/posts/variants/320'))
+
+    def test_thumbnails_are_fetched_in_one_query(self):
+        """Превью всех постов страницы находятся одним запросом."""
+        posts = []
+        for index in range(3):
+            post = self.create_post(image=SimpleUploadedFile(
+                f'small{index}.gif', SMALL_GIF, content_type='image/gif'))
+            generate_thumbnails(post)
+            posts.append(post)
+        cache.clear()
+        posts = list(Post.objects.feed())
+        with CaptureQueriesContext(connection) as queries:
+            attach_thumbnails(posts)
+        self.assertEqual(len(queries), 1)
+        for post in posts:
+            with self.subTest(post=post.id):
+                self.assertIsNotNone(post.prefetched_thumbnail)
+                self.assertEqual(post.prefetched_thumbnail.width, 960)
+        with self.assertNumQueries(0):
+            attach_thumbnails(posts)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, posts[0].prefetched_thumbnail.url)
+
+    def test_backfill(self):
+        post = self.create_post(image=SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif'))
+        self.create_post()
+        ThumbnailJob.objects.all().delete()
+        call_command('backfill_thumbnails', stdout=StringIO())
+        self.assertEqual(
+            list(ThumbnailJob.objects.values_list('post', flat=True)),
+            [post.id]
+        )
@@ -1,12 +1,18 @@
+import hashlib
+import re
 import shutil
 
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from django.test import Client, TestCase
 
-from posts.models import Group, Post, User
-from posts.settings import PAGE_SIZE
+from posts.models import Comment, Group, Post, User
+from posts.paginator import FeedPaginator, encode_cursor
+from posts.settings import COMMENTS_PAGE_SIZE, PAGE_SIZE
 
 INDEX = reverse('index')
 NEW_POST = reverse('new_post')
@@ -51,6 +57,8 @@ class PagesTests(TestCase):
             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
             b'\x0A\x00\x3B'
         )
+        digest = hashlib.sha256(small_gif).hexdigest()
+        cls.image_name = f'posts/{digest[:2]}/{digest}.gif'
         cls.uploaded_file = SimpleUploadedFile(
             name='small.gif',
             content=small_gif,
@@ -103,7 +111,7 @@ class PagesTests(TestCase):
                 self.assertEqual(first_post.group, self.post.group)
                 self.assertEqual(first_post.author, self.post.author)
                 self.assertEqual(
-                    first_post.image, f'posts/{self.uploaded_file.name}'
+                    first_post.image, self.image_name
                 )
 
     def test_view_post_correct_context(self):
@@ -118,7 +126,7 @@ class PagesTests(TestCase):
             self.assertEqual(one_post.group, self.post.group)
             self.assertEqual(one_post.author, self.post.author)
             self.assertEqual(
-                one_post.image, f'posts/{self.uploaded_file.name}'
+                one_post.image, self.image_name
             )
 
     def test_group_show_correct_context(self):
@@ -169,6 +177,7 @@ class PaginatorViewsTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
 
     def test_first_page_content(self):
@@ -185,6 +194,89 @@ class PaginatorViewsTest(TestCase):
             SECOND_PAGE_ITEMS_COUNT
         )
 
+    def test_cursor_pages_content(self):
+        """Keyset-режим отдает те же страницы, что и номера страниц."""
+        first_page = self.client.get(INDEX).context['page']
+        second_page = self.client.get(INDEX + '?page=2').context['page']
+        cursor_page = self.client.get(
+            INDEX + '?after=' + encode_cursor(
+                [first_page[-1].pub_date, first_page[-1].id]
+            )
+        ).context['page']
+        self.assertEqual(list(cursor_page), list(second_page))
+        self.assertFalse(cursor_page.has_next())
+        back_page = self.client.get(
+            INDEX + '?before=' + cursor_page.previous_cursor
+        ).context['page']
+        self.assertEqual(list(back_page), list(first_page))
+        self.assertFalse(back_page.has_previous())
+        self.assertTrue(back_page.has_next())
+
+    def test_next_link_leads_to_cursor_page(self):
+        """Ссылка «Следующая» с первой страницы ведет в keyset-режим."""
+        response = self.client.get(INDEX)
+        link = re.search(
+            r'href="(\?after=[^"]+)">Следующая', response.content.decode())
+        self.assertIsNotNone(link)
+        second_page = self.client.get(INDEX + link.group(1)).context['page']
+        self.assertTrue(second_page.is_cursor)
+        self.assertEqual(
+            list(second_page),
+            list(self.client.get(INDEX + '?page=2').context['page'])
+        )
+        self.assertTrue(second_page.has_previous())
+
+    def test_cursor_page_does_not_count(self):
+        """Keyset-страница не выполняет COUNT(*)."""
+        first_page = self.client.get(INDEX).context['page']
+        token = encode_cursor([first_page[0].pub_date, first_page[0].id])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(INDEX + '?after=' + token)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries
+        ))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(INDEX + '?after=broken')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page'].number, 1)
+
+
+class FeedPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        for index in range(ITEMS_COUNT):
+            Post.objects.create(text=f'запись номер {index}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_window(self):
+        """Выводится окно страниц вокруг текущей, первая и последняя."""
+        paginator = FeedPaginator(range(100), 1)
+        windows = [
+            [1, [1, 2, 3, None, 100]],
+            [4, [1, 2, 3, 4, 5, 6, None, 100]],
+            [50, [1, None, 48, 49, 50, 51, 52, None, 100]],
+            [100, [1, None, 98, 99, 100]],
+        ]
+        for number, window in windows:
+            with self.subTest(number=number):
+                self.assertEqual(
+                    paginator.page(number).page_window, window)
+
+    def test_count_is_cached_until_new_post(self):
+        """Число постов в ленте берется из кэша до новой записи."""
+        self.client.get(INDEX)
+        with self.assertNumQueries(2):
+            self.client.get(INDEX + '?page=2')
+        Post.objects.create(text='Новая запись', author=self.user)
+        response = self.client.get(INDEX)
+        self.assertEqual(
+            response.context['page'].paginator.count, ITEMS_COUNT + 1)
+
 
 class CacheViewsTest(TestCase):
     @classmethod
@@ -192,24 +284,185 @@ class CacheViewsTest(TestCase):
         super().setUpClass()
         cls.user = User.objects.create_user(username='testuser')
         post_note = 'Создаем пост'
-        Post.objects.create(
+        cls.post = Post.objects.create(
             text=post_note,
             author=cls.user
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
 
     def test_cache_index_pages(self):
         """Проверяем работу кэша главной страницы."""
         first_response = self.client.get(INDEX)
+        # Изменение в обход сигналов не сбрасывает кэш
+        Post.objects.filter(pk=self.post.pk).update(text='Незаметная правка')
+        cached_response = self.client.get(INDEX)
+        self.assertEqual(first_response.content, cached_response.content)
         anoter_post_note = 'Еще один пост'
         Post.objects.create(
             text=anoter_post_note,
             author=self.user
         )
         response_after_post_add = self.client.get(INDEX)
-        self.assertEqual(
-            len(first_response.content),
-            len(response_after_post_add.content)
+        self.assertContains(response_after_post_add, anoter_post_note)
+
+    def test_group_change_invalidates_feeds(self):
+        """Переименование группы сбрасывает кэш лент."""
+        group = Group.objects.create(
+            title='Старое название', slug='group', description=DESCRIPTION)
+        Post.objects.create(text='Пост', author=self.user, group=group)
+        self.client.get(INDEX)
+        group.title = 'Новое название'
+        group.save()
+        self.assertContains(self.client.get(INDEX), group.title)
+
+
+class PostFragmentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_viewer_parts_of_shared_fragment(self):
+        """Общий фрагмент поста по-разному выглядит для разных читателей."""
+        clients = [
+            [self.client, 'Открыть пост', False],
+            [self.reader_client, 'Добавить комментарий', False],
+            [self.authorized_client, 'Добавить комментарий', True],
+        ]
+        for client, open_text, can_edit in clients:
+            with self.subTest(can_edit=can_edit, open_text=open_text):
+                response = client.get(PROFILE)
+                self.assertContains(response, open_text)
+                self.assertNotContains(response, '<!--viewer:')
+                if can_edit:
+                    self.assertContains(response, 'Редактировать')
+                else:
+                    self.assertNotContains(response, 'Редактировать')
+
+    def test_anonymous_conditional_get(self):
+        """Аноним с ETag получает 304 без запросов к базе до новой записи."""
+        response = self.client.get(INDEX)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(INDEX, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        with self.assertNumQueries(0):
+            cached = self.client.get(INDEX)
+        self.assertEqual(cached.content, response.content)
+        Post.objects.create(text='Новый пост', author=self.user)
+        response = self.client.get(INDEX, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый пост')
+
+    def test_authorized_pages_are_not_cached(self):
+        response = self.authorized_client.get(INDEX)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_post_fragment_follows_modification(self):
+        """Фрагмент поста обновляется после редактирования поста."""
+        self.client.get(PROFILE)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        self.assertNotContains(self.client.get(PROFILE), 'Без сигналов')
+        self.post.text = 'Отредактированный пост'
+        self.post.save()
+        self.assertContains(self.client.get(PROFILE), self.post.text)
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        for index in range(COMMENTS_PAGE_SIZE + 1):
+            Comment.objects.create(
+                text=f'комментарий {index}',
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader{index}')
+            )
+        cls.VIEW_POST = reverse('post', args=[USERNAME, cls.post.id])
+        cls.POST_COMMENTS = reverse(
+            'post_comments', args=[USERNAME, cls.post.id])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_comments_are_loaded_in_chunks(self):
+        """Комментарии выводятся порциями, следующая — по курсору."""
+        with self.assertNumQueries(4):
+            response = self.client.get(self.VIEW_POST)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PAGE_SIZE)
+        self.assertTrue(comments.has_next())
+        next_url = self.POST_COMMENTS + '?after=' + comments.next_cursor
+        self.assertContains(response, next_url)
+        with self.assertNumQueries(3):
+            response = self.client.get(next_url)
+        self.assertTemplateUsed(response, 'comments_list.html')
+        rest = response.context['comments']
+        self.assertEqual(list(rest), list(self.post.comments.all())[-1:])
+        self.assertFalse(rest.has_next())
+
+    def test_invalid_comments_cursor(self):
+        response = self.client.get(self.POST_COMMENTS + '?after=broken')
+        self.assertEqual(response.status_code, 404)
+
+
+class FeedQueriesTest(TestCase):
+    """Число запросов к базе при выводе ленты не зависит от числа постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Группа',
+            description=DESCRIPTION,
+            slug=GROUP_WITH_POST_SLAG
         )
+        cls.user = User.objects.create_user(username=USERNAME)
+        authors = [cls.user] + [
+            User.objects.create_user(username=f'author{index}')
+            for index in range(3)
+        ]
+        for index in range(ITEMS_COUNT):
+            Post.objects.create(
+                text=f'запись номер {index}',
+                author=authors[index % len(authors)],
+                group=cls.group if index % 2 else None
+            )
+        cls.VIEW_POST = reverse('post', args=[
+            USERNAME, cls.user.posts.first().id
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_queries(self):
+        """Лента отрисовывается фиксированным числом запросов.
+
+        Для анонимного читателя к ним добавляется поиск id группы
+        или автора для кэша страниц.
+        """
+        url_queries = [
+            [INDEX, 3],
+            [GROUP_WITH_POSTS, 5],
+            [PROFILE, 5],
+            [self.VIEW_POST, 4],
+        ]
+        for url, queries in url_queries:
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    self.client.get(url)
@@ -0,0 +1,210 @@
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as thumbnail_defaults
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+try:
+    # Регистрирует в Pillow кодек AVIF
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+from .cache import bump_feeds, post_feeds
+from .models import Post, PostImageVariant, StoredFile, ThumbnailJob
+from .settings import (IMAGE_VARIANT_FORMATS, IMAGE_VARIANT_QUALITY,
+                       IMAGE_VARIANT_RATIO, IMAGE_VARIANT_WIDTHS,
+                       THUMBNAIL_GEOMETRIES, THUMBNAIL_MAX_ATTEMPTS)
+
+logger = logging.getLogger(__name__)
+
+
+def generate_thumbnails(post):
+    """Создает все превью картинки поста, которые нужны шаблонам."""
+    for geometry, options in THUMBNAIL_GEOMETRIES:
+        get_thumbnail(post.image, geometry, **options)
+
+
+def variant_formats():
+    """Форматы, которые умеет сохранять установленный Pillow.
+
+    Без pillow-avif-plugin AVIF пропускается, WEBP и JPEG остаются.
+    """
+    Image.init()
+    return [name for name in IMAGE_VARIANT_FORMATS if name in Image.SAVE]
+
+
+def variant_widths(source_width):
+    # Картинку не растягиваем: берем ширины не больше исходной,
+    # но хотя бы одну, самую маленькую
+    widths = [width for width in IMAGE_VARIANT_WIDTHS if width <= source_width]
+    return widths or IMAGE_VARIANT_WIDTHS[:1]
+
+
+def generate_variants(post):
+    """Пересоздает варианты картинки поста для srcset."""
+    ratio_width, ratio_height = IMAGE_VARIANT_RATIO
+    with post.image.open('rb') as image_file:
+        source = Image.open(image_file)
+        source.load()
+    source = source.convert('RGB')
+    variants = []
+    for width in variant_widths(source.width):
+        height = round(width * ratio_height / ratio_width)
+        frame = ImageOps.fit(source, (width, height), Image.LANCZOS)
+        for image_format in variant_formats():
+            buffer = BytesIO()
+            frame.save(buffer, image_format, quality=IMAGE_VARIANT_QUALITY)
+            variant = PostImageVariant(
+                post=post,
+                format=image_format,
+                width=width,
+                height=height
+            )
+            # Хранилище назовет файл по хэшу: у одинаковых картинок
+            # разных постов и варианты окажутся общими
+            variant.file.save(
+                f'{width}.{image_format.lower()}',
+                ContentFile(buffer.getvalue()),
+                save=False
+            )
+            variants.append(variant)
+    old_variants = list(post.image_variants.all())
+    with transaction.atomic():
+        if not Post.objects.filter(
+                pk=post.pk, image=post.image.name).exists():
+            # Пока варианты строились, картинку поста сменили: файлы
+            # без ссылок удалит collect_media, варианты новой картинки
+            # построит перезапущенная задача
+            for variant in variants:
+                StoredFile.objects.get_or_create(name=variant.file.name)
+            return
+        # Файлы старых вариантов удалит collect_media, когда на них
+        # не останется ссылок
+        PostImageVariant.objects.filter(
+            pk__in=[variant.pk for variant in old_variants]).delete()
+        PostImageVariant.objects.bulk_create(variants)
+        for variant in variants:
+            StoredFile.change(variant.file.name, 1)
+        # Сигналы не срабатывают на update(): сбрасываем кэши сами
+        Post.objects.filter(pk=post.pk).update(updated=timezone.now())
+        bump_feeds(post_feeds(post))
+
+
+def thumbnail_file(image, geometry, options):
+    """ImageFile будущего превью, как его назовет sorl-thumbnail.
+
+    Повторяет начало ThumbnailBackend.get_thumbnail(), но не обращается
+    ни к хранилищу, ни к KV-хранилищу.
+    """
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(thumbnail_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def attach_thumbnails(posts):
+    """Находит превью для всех постов страницы одним запросом.
+
+    Превью кладется в post.prefetched_thumbnail. Посты с готовыми
+    вариантами картинки и посты, для которых превью еще нет,
+    остаются без него.
+    """
+    geometry, options = THUMBNAIL_GEOMETRIES[0]
+    keys = {}
+    for post in posts:
+        post.prefetched_thumbnail = None
+        if post.image and not post.image_variants.all():
+            thumbnail = thumbnail_file(post.image, geometry, options)
+            # Одинаковые картинки хранятся одним файлом: у нескольких
+            # постов страницы может оказаться общее превью
+            keys.setdefault(add_prefix(thumbnail.key), []).append(post)
+    if not keys:
+        return
+    kv_cache = default.kvstore.cache
+    values = kv_cache.get_many(list(keys))
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(
+            KVStore.objects.filter(key__in=missing).values_list(
+                'key', 'value')
+        )
+        kv_cache.set_many(found, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(found)
+    for key, value in values.items():
+        if isinstance(value, str):
+            thumbnail = deserialize_image_file(value)
+            for post in keys[key]:
+                post.prefetched_thumbnail = thumbnail
+
+
+def enqueue_thumbnails(sources):
+    """Ставит в очередь пары (id поста, имя картинки).
+
+    Задача, которая уже стоит в очереди или выполняется, перезапускается
+    для новой картинки: воркер, закончив старую, ее не удалит.
+    """
+    sources = dict(sources)
+    queued = set(
+        ThumbnailJob.objects.filter(post_id__in=list(sources))
+        .values_list('post_id', flat=True)
+    )
+    for post_id in queued:
+        ThumbnailJob.objects.filter(post_id=post_id).update(
+            source=sources.pop(post_id), attempts=0)
+    if not sources:
+        return
+    try:
+        with transaction.atomic():
+            ThumbnailJob.objects.bulk_create(
+                ThumbnailJob(post_id=post_id, source=source)
+                for post_id, source in sources.items()
+            )
+    except IntegrityError:
+        # Задачу успел поставить параллельный запрос
+        enqueue_thumbnails(sources)
+
+
+def process_thumbnail_jobs(limit):
+    """Выполняет до limit задач из очереди, возвращает их число."""
+    jobs = list(
+        ThumbnailJob.objects.filter(attempts__lt=THUMBNAIL_MAX_ATTEMPTS)
+        .select_related('post')[:limit]
+    )
+    for job in jobs:
+        # Если картинку сменили, пока задача выполнялась, задача уже
+        # перезапущена с другим source: ее не трогаем
+        current = ThumbnailJob.objects.filter(pk=job.pk, source=job.source)
+        try:
+            if job.post.image:
+                generate_thumbnails(job.post)
+                generate_variants(job.post)
+        except Exception:
+            logger.exception('Не удалось создать превью для поста %s',
+                             job.post_id)
+            current.update(attempts=F('attempts') + 1)
+        else:
+            current.delete()
+    return len(jobs)
+
+
+def posts_with_images():
+    return Post.objects.exclude(image='').exclude(image__isnull=True)
@@ -0,0 +1,171 @@
+"""Лента подписок с раскладкой постов при записи (fan-out on write).
+
+Новый пост сразу попадает в TimelineEntry каждого подписчика, и
+лента читается одним проходом по индексу. Посты авторов с очень
+большим числом подписчиков не раскладываются, а подмешиваются при
+чтении (fan-out on read). Автор, чьи посты хоть раз не разложили,
+остается подмешиваемым и после того, как подписчиков стало меньше:
+иначе эти посты пропали бы из лент.
+"""
+from django.db import connection
+from django.db.models import Count
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .paginator import AFTER, BEFORE, CursorPaginator
+from .settings import (FANOUT_BATCH_SIZE, FANOUT_MAX_FOLLOWERS,
+                       TIMELINE_LENGTH, TIMELINE_TRIM_SLACK)
+
+
+def is_celebrity(author_id):
+    """Посты автора не раскладываются, а подмешиваются при чтении."""
+    stats = AuthorStats.objects.filter(author_id=author_id)
+    stats.filter(
+        read_on_demand=False,
+        followers_count__gte=FANOUT_MAX_FOLLOWERS
+    ).update(read_on_demand=True)
+    return stats.filter(read_on_demand=True).exists()
+
+
+def overflowing_timelines(follower_ids):
+    return list(
+        TimelineEntry.objects.filter(follower_id__in=follower_ids)
+        .order_by().values('follower_id').annotate(total=Count('id'))
+        .filter(total__gt=TIMELINE_LENGTH + TIMELINE_TRIM_SLACK)
+        .values_list('follower_id', flat=True)
+    )
+
+
+def trim_timelines(follower_ids):
+    """Оставляет TIMELINE_LENGTH свежих постов в переросших лентах.
+
+    Остальные ленты не трогаем: подсчет идет по индексу, а удаление
+    с оконной функцией, которое держит блокировку записи, случается
+    у читателя раз в TIMELINE_TRIM_SLACK постов.
+    """
+    follower_ids = overflowing_timelines(follower_ids) if follower_ids else []
+    if not follower_ids:
+        return
+    table = TimelineEntry._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            f'SELECT id FROM ('
+            f'SELECT id, ROW_NUMBER() OVER ('
+            f'PARTITION BY follower_id ORDER BY pub_date DESC, post_id DESC'
+            f') AS position FROM {table} WHERE follower_id IN ({{}})'
+            f') WHERE position > %s)'.format(
+                ', '.join(['%s'] * len(follower_ids))),
+            [*follower_ids, TIMELINE_LENGTH]
+        )
+
+
+def push_entries(entries, follower_ids):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+    trim_timelines(follower_ids)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    batch = []
+    for follower_id in follower_ids.iterator():
+        batch.append(follower_id)
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            push_entries(timeline_entries(post, batch), batch)
+            batch = []
+    push_entries(timeline_entries(post, batch), batch)
+
+
+def timeline_entries(post, follower_ids):
+    return [
+        TimelineEntry(
+            follower_id=follower_id,
+            post_id=post.pk,
+            pub_date=post.pub_date
+        )
+        for follower_id in follower_ids
+    ]
+
+
+def backfill_timeline(follower_id, author_id):
+    """Добавляет в ленту нового подписчика последние посты автора."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list('id', 'pub_date')
+    push_entries(
+        [
+            TimelineEntry(
+                follower_id=follower_id,
+                post_id=post_id,
+                pub_date=pub_date
+            )
+            for post_id, pub_date in posts[:TIMELINE_LENGTH]
+        ],
+        [follower_id]
+    )
+
+
+def drop_author(follower_id, author_id):
+    TimelineEntry.objects.filter(
+        follower_id=follower_id, post__author_id=author_id).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Keyset-паджинатор ленты подписок.
+
+    Сливает две выборки с одинаковым ключом (дата, id поста): записи
+    TimelineEntry читателя и посты авторов, которые раскладываются
+    при чтении.
+    """
+
+    def __init__(self, user, per_page):
+        super().__init__(Post.objects.feed(), per_page)
+        self.user = user
+
+    def _sources(self):
+        celebrities = Follow.objects.filter(
+            user=self.user,
+            author__stats__read_on_demand=True
+        ).values('author_id')
+        return [
+            (
+                TimelineEntry.objects.filter(follower=self.user),
+                ('pub_date', 'post_id')
+            ),
+            (
+                Post.objects.filter(author__in=celebrities),
+                ('pub_date', 'id')
+            ),
+        ]
+
+    def _items(self, cursor, forward):
+        limit = self.per_page + 1
+        keys = set()
+        for queryset, fields in self._sources():
+            if cursor is not None:
+                queryset = self._seek(queryset, cursor, forward, fields)
+            prefix = '-' if forward == self.descending else ''
+            keys.update(queryset.order_by(
+                *[prefix + field for field in fields]
+            ).values_list(*fields)[:limit])
+        # Пост автора, который недавно стал «знаменитым», может
+        # оказаться в обеих выборках: set убирает повтор
+        keys = sorted(keys, reverse=forward == self.descending)[:limit]
+        posts = self.object_list.in_bulk([pk for _, pk in keys])
+        return [posts[pk] for _, pk in keys if pk in posts]
+
+
+def timeline_page(request, user, per_page):
+    """Страница ленты подписок по ?after= или ?before=.
+
+    Для испорченного курсора поднимает InvalidCursor.
+    """
+    after = request.GET.get(AFTER) or None
+    before = None if after else request.GET.get(BEFORE) or None
+    return TimelinePaginator(user, per_page).get_page(
+        after=after, before=before)
@@ -1,12 +1,39 @@
-from django.urls import path
+from django.urls import path, register_converter
 
 from . import views
+from .syndication import FeedFormatConverter
+
+register_converter(FeedFormatConverter, 'feed_format')
 
 urlpatterns = [
     path(
         'new/',
         views.new_post,
         name='new_post'),
+    path(
+        'follow/',
+        views.follow_index,
+        name='follow_index'),
+    path(
+        'export/<str:kind>/',
+        views.export,
+        name='export'),
+    path(
+        'search/',
+        views.search,
+        name='search'),
+    path(
+        'feeds/index.<feed_format:feed_format>',
+        views.index_syndication,
+        name='index_syndication'),
+    path(
+        'feeds/group/<slug:slug>.<feed_format:feed_format>',
+        views.group_syndication,
+        name='group_syndication'),
+    path(
+        'feeds/author/<str:username>.<feed_format:feed_format>',
+        views.profile_syndication,
+        name='profile_syndication'),
     path(
         'group/<slug:slug>/',
         views.group_posts,
@@ -15,6 +42,14 @@ urlpatterns = [
         '<str:username>/',
         views.profile,
         name='profile'),
+    path(
+        '<str:username>/follow/',
+        views.profile_follow,
+        name='profile_follow'),
+    path(
+        '<str:username>/unfollow/',
+        views.profile_unfollow,
+        name='profile_unfollow'),
     path(
         '<str:username>/<int:post_id>/',
         views.post_view,
@@ -23,6 +58,10 @@ urlpatterns = [
         '<str:username>/<int:post_id>/edit/',
         views.post_edit,
         name='post_edit'),
+    path(
+        '<str:username>/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'),
     path(
         '<str:username>/<int:post_id>/comment',
         views.add_comment,
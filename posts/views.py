@@ -1,27 +1,89 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 
+from .archive import TieredFeed, find_post
+from .cache import (INDEX_FEED, author_feed, feed_version, group_feed,
+                    post_feed)
+from .decorators import anonymous_cache, replica_reads
+from .export import EXPORTS, FORMATS, export_stream
 from .forms import CommentForm, PostForm
-from .models import User, Group, Post
-from .settings import PAGE_SIZE
+from .fragments import render_for_viewer
+from .models import ArchivedPost, AuthorStats, Follow, User, Group, Post
+from .paginator import (AFTER, BEFORE, InvalidCursor, cursor_paginate,
+                        paginate)
+from .search import search_posts
+from .syndication import build_document, syndication_response
+from .timeline import timeline_page
+from .settings import COMMENTS_PAGE_SIZE, PAGE_SIZE
 
 
+def index_feeds():
+    return [INDEX_FEED]
+
+
+def group_feeds(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'id', flat=True).first()
+    if group_id is None:
+        return None
+    return [group_feed(group_id)]
+
+
+def profile_feeds(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'id', flat=True).first()
+    if author_id is None:
+        return None
+    return [author_feed(author_id)]
+
+
+def post_feeds(username, post_id):
+    feeds = profile_feeds(username)
+    if feeds is None:
+        return None
+    return feeds + [post_feed(post_id)]
+
+
+@anonymous_cache(index_feeds)
+@replica_reads(index_feeds)
 def index(request):
-    latest = Post.objects.all()
-    paginator = Paginator(latest, PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, "index.html", {"page": page})
+    latest = Post.objects.feed()
+    page = paginate(request, latest, INDEX_FEED)
+    return render_for_viewer(request, "index.html", {
+        "page": page,
+        "feed_version": feed_version(INDEX_FEED)
+    })
 
 
+@anonymous_cache(group_feeds)
+@replica_reads(group_feeds)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, "group.html", {"group": group, "page": page})
+    posts = group.posts.feed()
+    feed = group_feed(group.id)
+    page = paginate(request, posts, feed)
+    return render_for_viewer(request, "group.html", {
+        "group": group,
+        "page": page,
+        "feed_version": feed_version(feed)
+    })
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    after = request.GET.get(AFTER) or None
+    try:
+        page = search_posts(
+            query, PAGE_SIZE,
+            after=after,
+            before=None if after else request.GET.get(BEFORE) or None
+        )
+    except InvalidCursor:
+        raise Http404('Неверный курсор поиска')
+    return render(request, 'search.html', {'query': query, 'page': page})
 
 
 @login_required
@@ -41,29 +103,83 @@ def new_post(request):
     return redirect('index')
 
 
+@anonymous_cache(profile_feeds)
+@replica_reads(profile_feeds)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'profile.html', {
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    stats = AuthorStats.get_for(author)
+    posts = author.posts.feed()
+    if stats.archived_posts_count:
+        posts = TieredFeed(
+            posts,
+            author.archived_posts.select_related('author', 'group'),
+            stats.archived_posts_count
+        )
+    feed = author_feed(author.id)
+    page = paginate(request, posts, feed)
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author).exists()
+    return render_for_viewer(request, 'profile.html', {
         'author': author,
-        'page': page
+        'stats': stats,
+        'following': following,
+        'page': page,
+        'feed_version': feed_version(feed)
     })
 
 
+def comments_page(request, post):
+    """Очередная порция комментариев вместе с авторами."""
+    comments = post.comments.select_related('author').only(
+        'id', 'post', 'text', 'created', 'author__id', 'author__username')
+    try:
+        return cursor_paginate(
+            request, comments, COMMENTS_PAGE_SIZE,
+            ordering=('-created', '-id')
+        )
+    except InvalidCursor:
+        raise Http404('Неверный курсор комментариев')
+
+
+@anonymous_cache(post_feeds)
+@replica_reads(post_feeds)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, id=post_id)
-    comments = post.comments.all()
+    post = find_post(
+        Post.objects.select_related('author__stats', 'group')
+        .prefetch_related('image_variants'),
+        ArchivedPost.objects.select_related('author__stats', 'group'),
+        username,
+        post_id
+    )
+    comments = comments_page(request, post)
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
         'author': post.author,
+        'stats': AuthorStats.get_for(post.author),
         'form': form,
-        'comments': comments
+        'comments': comments,
+        'archived': isinstance(post, ArchivedPost)
     }
-    return render(request, 'post.html', context)
+    return render_for_viewer(request, 'post.html', context)
+
+
+@anonymous_cache(post_feeds)
+def post_comments(request, username, post_id):
+    post = find_post(
+        Post.objects.select_related('author').only('id', 'author__username'),
+        ArchivedPost.objects.select_related('author').only(
+            'id', 'author__username'),
+        username,
+        post_id
+    )
+    return render(request, 'comments_list.html', {
+        'post': post,
+        'comments': comments_page(request, post)
+    })
 
 
 @login_required
@@ -107,3 +223,71 @@ def add_comment(request, username, post_id):
         comment.post = post
         comment.save()
     return redirect('post', username=username, post_id=post_id)
+
+
+@login_required
+def follow_index(request):
+    try:
+        page = timeline_page(request, request.user, PAGE_SIZE)
+    except InvalidCursor:
+        raise Http404('Неверный курсор ленты')
+    return render_for_viewer(request, 'follow.html', {'page': page})
+
+
+@login_required
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Follow.objects.get_or_create(user=request.user, author=author)
+    return redirect('profile', username=username)
+
+
+@login_required
+def profile_unfollow(request, username):
+    Follow.objects.filter(
+        user=request.user, author__username=username).delete()
+    return redirect('profile', username=username)
+
+
+def index_syndication(request, feed_format):
+    return syndication_response(
+        request, feed_format, INDEX_FEED,
+        lambda: build_document(
+            request, feed_format, 'Последние обновления на сайте',
+            reverse('index'), Post.objects.all()
+        )
+    )
+
+
+def group_syndication(request, slug, feed_format):
+    group = get_object_or_404(Group, slug=slug)
+    return syndication_response(
+        request, feed_format, group_feed(group.id),
+        lambda: build_document(
+            request, feed_format, f'Записи сообщества {group.title}',
+            reverse('group_posts', args=[group.slug]), group.posts.all()
+        )
+    )
+
+
+def profile_syndication(request, username, feed_format):
+    author = get_object_or_404(User, username=username)
+    return syndication_response(
+        request, feed_format, author_feed(author.id),
+        lambda: build_document(
+            request, feed_format, f'Записи @{author.username}',
+            reverse('profile', args=[author.username]), author.posts.all()
+        )
+    )
+
+
+@staff_member_required
+def export(request, kind):
+    file_format = request.GET.get('format', 'jsonl')
+    if kind not in EXPORTS or file_format not in FORMATS:
+        raise Http404('Неизвестная выгрузка')
+    response = StreamingHttpResponse(
+        export_stream(kind, file_format), content_type='application/gzip')
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{file_format}.gz"')
+    return response
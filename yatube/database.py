@@ -0,0 +1,19 @@
+"""Настройка каждого нового соединения с SQLite.
+
+PRAGMA из settings.SQLITE_PRAGMAS выполняются сразу после открытия
+соединения; при постоянных соединениях (CONN_MAX_AGE) — один раз на
+соединение, а не на каждый запрос.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    for name, value in pragmas.items():
+        # Имена и значения берутся только из настроек, не от клиента
+        connection.connection.execute(f'PRAGMA {name}={value}')
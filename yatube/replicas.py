@@ -0,0 +1,99 @@
+"""Чтение из реплики с гарантией «читаю свои записи».
+
+Запросы внутри use_replica читают из базы 'replica' (если она
+настроена), все остальные и все записи идут в основную. Пользователь,
+который что-то записал, получает cookie и следующие REPLICA_MAX_LAG
+секунд читает только из основной базы, поэтому после редиректа видит
+свой пост или комментарий, даже если реплика отстала.
+
+Пока реплика может не видеть последних записей, ключи кэша получают
+метку read_tag(): собранное из реплики не попадает в кэш под ключом,
+по которому читаются страницы из основной базы.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+STICKY_COOKIE = 'use_primary'
+# Сессия нужна сразу после входа, ее читаем только из основной базы
+PRIMARY_ONLY_APPS = ('sessions',)
+
+_state = threading.local()
+
+
+def replica_available():
+    return REPLICA in connections.databases
+
+
+def read_tag():
+    """'replica', пока чтения идут в реплику, которая может отставать."""
+    return getattr(_state, 'read_tag', '')
+
+
+@contextmanager
+def use_replica(request, lagging=False):
+    """Чтения внутри блока идут в реплику.
+
+    lagging — реплика может еще не видеть последних записей. Если
+    реплики нет или пользователь недавно писал, блок читает из
+    основной базы.
+    """
+    if not replica_available() or STICKY_COOKIE in request.COOKIES:
+        yield
+        return
+    previous = (
+        getattr(_state, 'read_alias', None), getattr(_state, 'read_tag', ''))
+    _state.read_alias = REPLICA
+    _state.read_tag = REPLICA if lagging else ''
+    try:
+        yield
+    finally:
+        _state.read_alias, _state.read_tag = previous
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = getattr(_state, 'read_alias', None)
+        if alias is None or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # В обеих базах одни и те же данные
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схему реплики приносит репликация
+        return db != REPLICA
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.read_alias = None
+        _state.read_tag = ''
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            wrote = _state.wrote
+        finally:
+            _state.read_alias = None
+            _state.read_tag = ''
+            _state.wrote = False
+        if wrote:
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_MAX_LAG,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
@@ -38,7 +38,7 @@ ALLOWED_HOSTS = [
 INSTALLED_APPS = [
     'about',
     'users',
-    'posts',
+    'posts.apps.PostsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -56,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'yatube.replicas.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -87,10 +88,49 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.environ.get(
+            'YATUBE_DB_PATH',
+            os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
     }
 }
 
+# Профиль базы. YATUBE_DB_PROFILE=production включает WAL (чтение не
+# ждет записи), настройки SQLite для конкурентной нагрузки и постоянные
+# соединения. PRAGMA выполняет yatube.database при открытии соединения
+DB_PROFILE = os.environ.get('YATUBE_DB_PROFILE', 'development')
+
+SQLITE_PRAGMAS = {}
+
+if DB_PROFILE == 'production':
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+    SQLITE_PRAGMAS = {
+        # Сначала таймаут: переключение журнала тоже ждет блокировку, мс
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        # Отрицательное значение — размер в КиБ, а не в страницах
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    }
+
+# Реплика для чтения лент (yatube/replicas.py): YATUBE_DB_REPLICA_PATH —
+# файл копии основной базы, которую поддерживает внешняя репликация.
+# Без нее все запросы идут в основную базу
+if os.environ.get('YATUBE_DB_REPLICA_PATH'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        NAME=os.environ['YATUBE_DB_REPLICA_PATH'],
+        TEST={'MIRROR': 'default'}
+    )
+
+DATABASE_ROUTERS = ['yatube.replicas.ReplicaRouter']
+
+# Верхняя граница отставания реплики, секунд: столько после записи
+# пользователь и ленты, в которые писали, читаются из основной базы
+REPLICA_MAX_LAG = 15
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -132,6 +172,9 @@ STATIC_URL = '/static/'
 
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
 
+# Имена с хэшем содержимого и сжатые копии .gz/.br (yatube/staticfiles.py)
+STATICFILES_STORAGE = 'yatube.staticfiles.CompressedManifestStaticFilesStorage'
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -148,8 +191,20 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
+# Тесты получают временный файл кэша вместо общего (yatube/test_runner.py)
+TEST_RUNNER = 'yatube.test_runner.DiscoverRunner'
+
+# Общий для всех воркеров на сервере кэш в файле SQLite
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH',
+            os.path.join(BASE_DIR, 'cache', 'cache.sqlite3')
+        ),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
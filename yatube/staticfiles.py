@@ -0,0 +1,148 @@
+"""Статика с хэшами в именах и заранее сжатыми копиями.
+
+collectstatic кладет рядом с каждым файлом вида app.3f2a9c.css его
+сжатые копии app.3f2a9c.css.gz и, если установлен пакет brotli,
+app.3f2a9c.css.br. Представление serve отдает подходящую копию;
+имена с хэшем никогда не меняют содержимого, поэтому браузер может
+кэшировать их навсегда.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import views as staticfiles_views
+from django.contrib.staticfiles.storage import (ManifestStaticFilesStorage,
+                                                staticfiles_storage)
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.map', '.svg', '.txt', '.json', '.xml', '.html',
+    '.ttf', '.eot', '.otf', '.ico',
+)
+# Сжатая копия не нужна, если она экономит меньше 5%
+MIN_COMPRESSION_RATIO = 0.95
+# Файлы с хэшем в имени кэшируются на год, остальные — на минуту
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+STATIC_MAX_AGE = 60
+
+
+def compressors():
+    """(Content-Encoding, расширение, функция) в порядке предпочтения."""
+    if brotli is not None:
+        yield 'br', '.br', lambda data: brotli.compress(data, quality=11)
+    yield 'gzip', '.gz', lambda data: gzip.compress(data, 9, mtime=0)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # collectstatic еще не запускали (разработка, тесты):
+            # отдаем файл под исходным именем
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            self.compress(name)
+
+    def compress(self, name):
+        if not name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        with self.open(name) as original:
+            data = original.read()
+        for encoding, extension, compress in compressors():
+            compressed_name = name + extension
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            compressed = compress(data)
+            if len(compressed) < len(data) * MIN_COMPRESSION_RATIO:
+                self._save(compressed_name, ContentFile(compressed))
+
+
+@lru_cache(maxsize=None)
+def immutable_names():
+    return frozenset(
+        getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+@receiver(setting_changed)
+def reset_immutable_names(setting, **kwargs):
+    if setting in ('STATIC_ROOT', 'STATICFILES_STORAGE'):
+        immutable_names.cache_clear()
+
+
+def accepted_encodings(request):
+    encodings = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        encoding, _, params = item.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00'):
+            encodings.add(encoding.strip().lower())
+    return encodings
+
+
+def compressed_copy(request, full_path):
+    """Путь к сжатой копии, которую примет клиент, и ее Content-Encoding."""
+    encodings = accepted_encodings(request)
+    for encoding, extension, _ in compressors():
+        if encoding in encodings and os.path.isfile(full_path + extension):
+            return full_path + extension, encoding
+    return full_path, None
+
+
+def serve(request, path):
+    """Отдает файл из STATIC_ROOT, по возможности уже сжатый."""
+    name = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = staticfiles_storage.path(name)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        if settings.DEBUG:
+            # До collectstatic ищем файл в каталогах приложений
+            return staticfiles_views.serve(request, path)
+        raise Http404
+    content_type, _ = mimetypes.guess_type(full_path)
+    compressible = name.lower().endswith(COMPRESSIBLE_EXTENSIONS)
+    content_encoding = None
+    if compressible:
+        full_path, content_encoding = compressed_copy(request, full_path)
+    stat = os.stat(full_path)
+    if not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            stat.st_mtime, stat.st_size):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(
+            open(full_path, 'rb'),
+            content_type=content_type or 'application/octet-stream'
+        )
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+    if compressible:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    if name in immutable_names():
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=STATIC_MAX_AGE)
+    return response
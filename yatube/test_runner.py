@@ -0,0 +1,42 @@
+"""Тесты работают со своим временным файлом кэша.
+
+Кэш по умолчанию — общий для всех процессов файл SQLite в
+BASE_DIR/cache, а тесты его очищают и наполняют.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import runner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def temporary_caches():
+    directory = tempfile.mkdtemp()
+    caches = {
+        alias: dict(
+            config,
+            LOCATION=os.path.join(directory, f'{alias}.sqlite3')
+        )
+        if config['BACKEND'] == 'yatube.cache.SQLiteCache' else config
+        for alias, config in settings.CACHES.items()
+    }
+    try:
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class DiscoverRunner(runner.DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches = temporary_caches()
+        self.caches.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
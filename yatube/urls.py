@@ -17,7 +17,9 @@ from django.conf import settings
 from django.conf.urls import handler404, handler500
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from .staticfiles import serve as serve_static
 
 handler404 = "posts.views.page_not_found"
 handler500 = "posts.views.server_error"
@@ -36,6 +38,12 @@ urlpatterns = [
     path(
         'about/',
         include('about.urls', namespace='about')),
+    path(
+        'api/v1/',
+        include('posts.api_urls', namespace='api')),
+    re_path(
+        r'^{}(?P<path>.*)$'.format(settings.STATIC_URL.lstrip('/')),
+        serve_static),
     path(
         '',
         include('posts.urls')),
@@ -45,6 +53,3 @@ if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL,
         document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(
-        settings.STATIC_URL,
-        document_root=settings.STATIC_ROOT)